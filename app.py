@@ -1,10 +1,115 @@
-from flask import Flask, render_template, request, jsonify
-from chatbot import generate_response
+import json
+import logging
+import os
+import re
+import uuid
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+
+# Set up before the other modules load, so messages logged while they start are kept
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+
+from chatbot import catalogue_version, catalogues, generate_response, readiness, start_warm_up, stream_response
+from recommendation import DEFAULT_SIMILAR_K, MAX_TOP_K, facet_counts, filter_laptops_batch, find_similar
+from metrics import CONTENT_TYPE, registry, stage_seconds
 import markdown2
 
 app = Flask(__name__)
 
-STATIC_SESSION_ID = 'test-session'
+# Clients keep their session ID in a cookie, or send it in a header
+SESSION_COOKIE = 'session_id'
+SESSION_HEADER = 'X-Session-ID'
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+SESSION_COOKIE_MAX_AGE = 30 * 24 * 3600
+
+# Every response names the catalogue version it was answered from
+CATALOGUE_VERSION_HEADER = 'X-Catalogue-Version'
+
+# Most preference objects accepted by one /recommend/batch request
+MAX_BATCH_SIZE = 10000
+
+# Load the catalogue, model and chains in the background while the server starts;
+# WARM_UP=0 leaves them to the first request that needs them
+if os.getenv("WARM_UP", "1").lower() not in ("0", "false", "no"):
+    start_warm_up()
+
+
+def resolve_session_id(headers, cookies):
+    """Return the client's session ID from the header or cookie, or a new one."""
+    for candidate in (headers.get(SESSION_HEADER), cookies.get(SESSION_COOKIE)):
+        if candidate and SESSION_ID_PATTERN.match(candidate):
+            return candidate
+    return uuid.uuid4().hex
+
+
+def set_session_cookie(response, session_id, cookies):
+    if cookies.get(SESSION_COOKIE) != session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, max_age=SESSION_COOKIE_MAX_AGE, httponly=True, samesite='Lax')
+    return response
+
+
+def has_message(data):
+    """True when a chat request body is an object with a non-empty "message" string."""
+    return isinstance(data, dict) and isinstance(data.get('message'), str) and bool(data['message'].strip())
+
+
+def resolve_top_k(data):
+    """Return the optional "top_k" request field, or raise ValueError when it is not 1..MAX_TOP_K."""
+    top_k = data.get('top_k')
+    if top_k is None:
+        return None
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or not 1 <= top_k <= MAX_TOP_K:
+        raise ValueError(f'"top_k" must be an integer from 1 to {MAX_TOP_K}.')
+    return top_k
+
+
+def find_similar_laptops(laptop_id, args):
+    """Run a /similar query: ``k`` results (default DEFAULT_SIMILAR_K), filtered by any ``modifier`` args."""
+    k = resolve_top_k({'top_k': args.get('k', DEFAULT_SIMILAR_K, type=int)})
+    return find_similar(laptop_id, k, modifiers=args.getlist('modifier'))
+
+
+def recommend_batch(data):
+    """Run a /recommend/batch request, or raise ValueError when the body is malformed."""
+    if not isinstance(data, dict) or not isinstance(data.get('preferences'), list):
+        raise ValueError('Invalid request. Provide a "preferences" list.')
+    preferences = data['preferences']
+    if len(preferences) > MAX_BATCH_SIZE:
+        raise ValueError(f'At most {MAX_BATCH_SIZE} preference objects per request.')
+    if not all(isinstance(item, dict) for item in preferences):
+        raise ValueError('Each item of "preferences" must be an object.')
+
+    snapshot = catalogues.current()
+    results = filter_laptops_batch(preferences, top_k=resolve_top_k(data), snapshot=snapshot)
+    return {"results": results, "catalogue_version": snapshot.version}
+
+
+def laptop_facets(data, method='POST'):
+    """Run a /facets request: counts for every laptop on GET, or for the body's "preferences" on POST.
+
+    POST results also rank exactly the counted laptops under "recommendations".
+    Raises ValueError when the body is malformed.
+    """
+    snapshot = catalogues.current()
+    if method == 'GET':
+        return facet_counts(snapshot=snapshot)
+    if not isinstance(data, dict) or not isinstance(data.get('preferences', {}), dict):
+        raise ValueError('Invalid request. Provide a "preferences" object.')
+    return facet_counts(data.get('preferences', {}), snapshot, rank_matches=True, top_k=resolve_top_k(data))
+
+
+def render_markdown(text):
+    with stage_seconds.time(stage='render_markdown'):
+        return markdown2.markdown(text)
+
+
+def format_event(event, payload):
+    """Encode one chat stream event as a Server-Sent Events frame."""
+    if event == 'done':
+        payload = {"response": render_markdown(payload)}
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
 
 @app.route('/')
 def home():
@@ -14,20 +119,104 @@ def home():
 @app.route('/chat', methods=['POST'])
 def chat():
     try:
-        data = request.json
-        if not data or 'message' not in data:
-            return jsonify({'error': 'Invalid request. Provide a "message" field.'}), 400
+        data = request.get_json(silent=True)
+        if not has_message(data):
+            return jsonify({'error': 'Invalid request. Provide a non-empty "message" string.'}), 400
 
         user_message = data['message']
+        top_k = resolve_top_k(data)
+        session_id = resolve_session_id(request.headers, request.cookies)
 
-        response = generate_response(user_message, session_id=STATIC_SESSION_ID)
-        formatted_response = markdown2.markdown(response)
-        
-        return jsonify({"response": formatted_response})
+        response = generate_response(user_message, session_id=session_id, top_k=top_k)
+        formatted_response = render_markdown(response)
+        version = catalogue_version(session_id)
+
+        response = jsonify({"response": formatted_response, "catalogue_version": version})
+        response.headers[CATALOGUE_VERSION_HEADER] = version
+        return set_session_cookie(response, session_id, request.cookies)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.get_json(silent=True)
+    if not has_message(data):
+        return jsonify({'error': 'Invalid request. Provide a non-empty "message" string.'}), 400
+
+    try:
+        top_k = resolve_top_k(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    user_message = data['message']
+    session_id = resolve_session_id(request.headers, request.cookies)
+
+    def events():
+        for event, payload in stream_response(user_message, session_id=session_id, top_k=top_k):
+            yield format_event(event, payload)
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+            CATALOGUE_VERSION_HEADER: catalogues.current().version,
+        },
+    )
+    return set_session_cookie(response, session_id, request.cookies)
+
+
+@app.route('/similar/<int:laptop_id>')
+def similar(laptop_id):
+    try:
+        results = find_similar_laptops(laptop_id, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(results)
+    response.headers[CATALOGUE_VERSION_HEADER] = results['catalogue_version']
+    return response, 404 if results['status'] == 'not_found' else 200
+
+
+@app.route('/recommend/batch', methods=['POST'])
+def recommend():
+    try:
+        results = recommend_batch(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(results)
+    response.headers[CATALOGUE_VERSION_HEADER] = results['catalogue_version']
+    return response
+
+
+@app.route('/facets', methods=['GET', 'POST'])
+def facets():
+    try:
+        results = laptop_facets(request.get_json(silent=True), request.method)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(results)
+    response.headers[CATALOGUE_VERSION_HEADER] = results['catalogue_version']
+    return response
+
+
+@app.route('/ready')
+def ready():
+    is_ready, details = readiness()
+    return jsonify(details), 200 if is_ready else 503
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
 @app.route('/favicon.ico')
 def favicon():
     return '', 204  
@@ -0,0 +1,135 @@
+"""Asyncio serving mode.
+
+Same routes as ``app.py`` on Quart, with the LLM calls awaited through
+``ainvoke``/``astream`` and filtering run in a thread pool, so a single
+process can keep hundreds of chats in flight. Run with::
+
+    hypercorn asgi:app
+"""
+import asyncio
+from quart import Quart, Response, render_template, request, jsonify
+from app import (
+    CATALOGUE_VERSION_HEADER, find_similar_laptops, format_event, has_message, laptop_facets, recommend_batch, render_markdown,
+    resolve_session_id, resolve_top_k, set_session_cookie,
+)
+from chatbot import agenerate_response, astream_response, catalogue_version, catalogues, filter_executor, readiness
+from metrics import CONTENT_TYPE, registry
+
+app = Quart(__name__)
+
+
+@app.route('/')
+async def home():
+    return await render_template('index.html')
+
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    try:
+        data = await request.get_json(silent=True)
+        if not has_message(data):
+            return jsonify({'error': 'Invalid request. Provide a non-empty "message" string.'}), 400
+
+        user_message = data['message']
+        top_k = resolve_top_k(data)
+        session_id = resolve_session_id(request.headers, request.cookies)
+
+        response = await agenerate_response(user_message, session_id=session_id, top_k=top_k)
+        formatted_response = render_markdown(response)
+        version = catalogue_version(session_id)
+
+        response = jsonify({"response": formatted_response, "catalogue_version": version})
+        response.headers[CATALOGUE_VERSION_HEADER] = version
+        return set_session_cookie(response, session_id, request.cookies)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/chat/stream', methods=['POST'])
+async def chat_stream():
+    data = await request.get_json(silent=True)
+    if not has_message(data):
+        return jsonify({'error': 'Invalid request. Provide a non-empty "message" string.'}), 400
+
+    try:
+        top_k = resolve_top_k(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    user_message = data['message']
+    session_id = resolve_session_id(request.headers, request.cookies)
+
+    async def events():
+        async for event, payload in astream_response(user_message, session_id=session_id, top_k=top_k):
+            yield format_event(event, payload)
+
+    response = Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+            CATALOGUE_VERSION_HEADER: catalogues.current().version,
+        },
+    )
+    return set_session_cookie(response, session_id, request.cookies)
+
+
+@app.route('/similar/<int:laptop_id>')
+async def similar(laptop_id):
+    try:
+        results = await asyncio.get_running_loop().run_in_executor(
+            filter_executor, find_similar_laptops, laptop_id, request.args,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(results)
+    response.headers[CATALOGUE_VERSION_HEADER] = results['catalogue_version']
+    return response, 404 if results['status'] == 'not_found' else 200
+
+
+@app.route('/recommend/batch', methods=['POST'])
+async def recommend():
+    data = await request.get_json(silent=True)
+    try:
+        results = await asyncio.get_running_loop().run_in_executor(filter_executor, recommend_batch, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(results)
+    response.headers[CATALOGUE_VERSION_HEADER] = results['catalogue_version']
+    return response
+
+
+@app.route('/facets', methods=['GET', 'POST'])
+async def facets():
+    data = await request.get_json(silent=True)
+    try:
+        results = await asyncio.get_running_loop().run_in_executor(
+            filter_executor, laptop_facets, data, request.method,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(results)
+    response.headers[CATALOGUE_VERSION_HEADER] = results['catalogue_version']
+    return response
+
+
+@app.route('/ready')
+async def ready():
+    is_ready, details = readiness()
+    return jsonify(details), 200 if is_ready else 503
+
+
+@app.route('/metrics')
+async def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/favicon.ico')
+async def favicon():
+    return '', 204
@@ -0,0 +1,7 @@
+"""Summary statistics shared by the benchmark reports."""
+
+
+def percentile(values, q):
+    """The ``q``-th percentile of ``values`` by nearest rank, so p50/p95/p99 are always measured samples."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,258 @@
+"""Scaling benchmark of the recommendation engine on synthetic catalogues.
+
+Builds catalogues with the schema of ``data/CleanedLaptopData.csv`` at each
+``--sizes`` row count by resampling the real laptops with jittered prices and
+scores, compiles them to the memory-mapped format the app serves, and times
+``filter_laptops``, the relaxation path (``plan_relaxation``),
+``format_results`` and ``filter_laptops_batch`` for a fixed set of preference
+profiles built from the knowledge base use cases. Reports latency percentiles
+and peak traced memory per call, writes the results as JSON and compares them
+with a stored baseline::
+
+    python benchmarks/engine.py
+    python benchmarks/engine.py --sizes 1000 100000 --min-time 0.5
+    python benchmarks/engine.py --save-baseline
+    python benchmarks/engine.py --csv-dir /tmp/synthetic   # also write the catalogues as CSV
+
+Exits with status 1 when an operation is slower than the baseline by more
+than ``--tolerance``.
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._stats import percentile
+from catalogue import CSV_PATH, PRICE, Catalogue, Snapshot, add_derived_columns
+from intent_parser import MAX_PRICE, MIN_PRICE, SAMPLE_QUERIES, USE_CASES
+from recommendation import SearchIndexes, filter_laptops, filter_laptops_batch, format_results, plan_relaxation
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, 'results', 'engine.json')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'engine_baseline.json')
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+# Scores jittered by up to this many points, prices by up to this fraction
+SCORE_JITTER = 5.0
+PRICE_JITTER = 0.15
+
+OPERATIONS = ['filter_laptops', 'relaxation', 'format_results', 'filter_laptops_batch']
+
+
+def synthetic_frame(rows, seed=0, source=CSV_PATH):
+    """A catalogue of ``rows`` laptops with the source CSV's columns.
+
+    Rows are drawn from the real laptops; prices, weights, ratings and scores
+    are jittered, and processor names get a revision suffix so configurations
+    repeat about as often as in the real data.
+    """
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(source)
+    frame = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+
+    frame['Unnamed: 0'] = np.arange(rows)
+    frame['index'] = np.arange(rows)
+    frame['link'] = [f"https://example.com/laptop/{i}" for i in range(rows)]
+    revisions = max(1, rows // len(base))
+    if revisions > 1:
+        frame['Processor name'] = frame['Processor name'] + ' r' + rng.integers(0, revisions, rows).astype(str)
+
+    price = frame[PRICE].to_numpy() * rng.uniform(1 - PRICE_JITTER, 1 + PRICE_JITTER, rows)
+    frame[PRICE] = (np.clip(price, MIN_PRICE, MAX_PRICE) // 10 * 10).astype(int)
+    frame['Weight (in kg)'] = np.round(frame['Weight (in kg)'] * rng.uniform(0.95, 1.05, rows), 2)
+    frame['user rating'] = np.clip(frame['user rating'] + rng.normal(0, 0.1, rows), 0, 5)
+    for column in ('Performance_Score', 'Portability', 'Value_Score'):
+        frame[column] = np.clip(frame[column] + rng.uniform(-SCORE_JITTER, SCORE_JITTER, rows), 0, 100)
+    return frame
+
+
+def load_snapshot(frame, directory):
+    """Compile ``frame`` into ``directory`` and open it memory-mapped, as the app serves it."""
+    Catalogue.from_frame(add_derived_columns(frame)).write(directory)
+    catalogue = Catalogue.open(directory)
+    return Snapshot(catalogue, SearchIndexes(catalogue))
+
+
+def benchmark_profiles():
+    """Fixed preference profiles: every knowledge base use case at its own, a tight and a loose budget,
+    and the knowledge base sample queries."""
+    profiles = {}
+    for name, template in USE_CASES.items():
+        profiles[name] = copy.deepcopy(template)
+
+        # A narrow budget at the bottom of the range usually needs relaxation
+        tight = copy.deepcopy(template)
+        low = template['price_range']['min']
+        tight['price_range'] = {'min': low, 'max': int(low * 1.1)}
+        profiles[f'{name}_tight_budget'] = tight
+
+        loose = copy.deepcopy(template)
+        loose['price_range'] = {'min': MIN_PRICE, 'max': MAX_PRICE}
+        del loose['specifications']['Screen Size (in inch)']
+        profiles[f'{name}_any_budget'] = loose
+
+    for i, sample in enumerate(SAMPLE_QUERIES.values()):
+        profiles[f'sample_{i + 1}'] = copy.deepcopy(sample)
+    return profiles
+
+
+def operations(snapshot, profiles):
+    """(name, one call per profile) for each timed operation."""
+    index = snapshot.index.ranges
+    candidates = {name: plan_relaxation(profile, index)[2] for name, profile in profiles.items()}
+    return {
+        'filter_laptops': [lambda p=p: filter_laptops(p, snapshot=snapshot) for p in profiles.values()],
+        'relaxation': [lambda p=p: plan_relaxation(p, index) for p in profiles.values()],
+        'format_results': [
+            lambda p=p, c=candidates[name]: format_results(c, limit=10, catalogue=snapshot.catalogue, preferences=p)
+            for name, p in profiles.items()
+        ],
+        # One call for all profiles, reported per profile
+        'filter_laptops_batch': [lambda: filter_laptops_batch(list(profiles.values()), snapshot=snapshot)],
+    }
+
+
+def time_calls(calls, per_call, min_time, min_rounds):
+    """Run every call in rounds until ``min_time`` seconds have passed; latencies in ms per profile."""
+    latencies = []
+    started = time.perf_counter()
+    rounds = 0
+    while rounds < min_rounds or time.perf_counter() - started < min_time:
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            latencies.append((time.perf_counter() - start) * 1000 / per_call)
+        rounds += 1
+    return latencies
+
+
+def peak_memory(calls):
+    """Largest traced allocation peak over one run of each call, in KiB."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for call in calls:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            call()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return max(peaks) / 1024
+
+
+def run(sizes, seed, min_time, min_rounds, csv_dir=None):
+    profiles = benchmark_profiles()
+    results = []
+    with tempfile.TemporaryDirectory(prefix='laptopgpt-bench-') as scratch:
+        for rows in sizes:
+            start = time.perf_counter()
+            frame = synthetic_frame(rows, seed)
+            if csv_dir:
+                os.makedirs(csv_dir, exist_ok=True)
+                frame.to_csv(os.path.join(csv_dir, f'laptops-{rows}.csv'), index=False)
+            snapshot = load_snapshot(frame, os.path.join(scratch, str(rows)))
+            del frame
+            print(f"{rows} rows: catalogue built in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+            for name, calls in operations(snapshot, profiles).items():
+                per_call = len(profiles) if name == 'filter_laptops_batch' else 1
+                for call in calls:
+                    call()  # warm up
+                latencies = time_calls(calls, per_call, min_time, min_rounds)
+                results.append({
+                    'rows': rows,
+                    'operation': name,
+                    'calls': len(latencies),
+                    'mean_ms': statistics.fmean(latencies),
+                    'p50_ms': percentile(latencies, 50),
+                    'p95_ms': percentile(latencies, 95),
+                    'p99_ms': percentile(latencies, 99),
+                    'peak_kib': peak_memory(calls) / per_call,
+                })
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'seed': seed,
+            'profiles': len(profiles),
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each operation against the baseline; returns the number of regressions."""
+    reference = {(entry['rows'], entry['operation']): entry for entry in baseline['results']}
+    regressions = 0
+    print(f"\nagainst baseline of {baseline['meta']['created']} (tolerance {tolerance:.2f}x)")
+    print(f"{'rows':>8} {'operation':<22} {'p50 ratio':>9} {'p95 ratio':>9}")
+    for entry in results['results']:
+        before = reference.get((entry['rows'], entry['operation']))
+        if before is None:
+            continue
+        p50 = entry['p50_ms'] / before['p50_ms'] if before['p50_ms'] else 1.0
+        p95 = entry['p95_ms'] / before['p95_ms'] if before['p95_ms'] else 1.0
+        regressed = p50 > tolerance
+        regressions += regressed
+        print(f"{entry['rows']:>8} {entry['operation']:<22} {p50:>8.2f}x {p95:>8.2f}x{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="catalogue row counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds spent timing each operation per size")
+    parser.add_argument("--min-rounds", type=int, default=3, help="least passes over the profiles per operation")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="results JSON (default: %(default)s)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="p50 slowdown counted as a regression")
+    parser.add_argument("--csv-dir", help="also write each synthetic catalogue as a CSV here")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.seed, args.min_time, args.min_rounds, args.csv_dir)
+
+    print(f"{'rows':>8} {'operation':<22} {'calls':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'peak KiB':>9}")
+    for entry in results['results']:
+        print(f"{entry['rows']:>8} {entry['operation']:<22} {entry['calls']:>6} {entry['mean_ms']:>9.3f} "
+              f"{entry['p50_ms']:>9.3f} {entry['p95_ms']:>9.3f} {entry['p99_ms']:>9.3f} {entry['peak_kib']:>9.0f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; store one with --save-baseline")
+        return 0
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    return 1 if compare(results, baseline, args.tolerance) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
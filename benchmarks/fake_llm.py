@@ -0,0 +1,214 @@
+"""Minimal OpenAI-compatible chat completions server for offline load tests.
+
+Answers ``POST /v1/chat/completions`` after a fixed delay, with a preferences
+JSON for parse prompts and a canned reply otherwise. Streaming requests get
+the reply as ``chat.completion.chunk`` events. Run standalone with::
+
+    python benchmarks/fake_llm.py --port 8765 --latency 0.5
+
+and point the app at it with ``OPENAI_BASE_URL=http://127.0.0.1:8765/v1``.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+
+PARSED_PREFERENCES = {
+    "specifications": {
+        "RAM (in GB)": 16,
+        "Storage": "512",
+        "Screen Size (in inch)": 15.6,
+        "dedicated_graphics": True
+    },
+    "price_range": {"min": 60000, "max": 100000},
+    "performance_range": {"min": 60, "max": 100},
+    "portability_range": {"min": 0, "max": 70}
+}
+
+REPLY = (
+    "Here are three laptops that fit your needs. The **best match** has a dedicated GPU, "
+    "16GB of RAM and a 512GB SSD, and the other two trade a little performance for a lower price."
+)
+
+
+def completion_text(body):
+    # Parse prompts end with the parse template; the history before it may mention anything
+    messages = body.get("messages") or [{}]
+    if str(messages[-1].get("content", "")).startswith("Given this knowledge base:"):
+        return json.dumps(PARSED_PREFERENCES)
+    return REPLY
+
+
+def completion(body, text):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def chunk(body, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+class FakeLLMServer:
+    def __init__(self, latency=0.5, chunk_delay=0.0, shared=None):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # SharedStats mirrored for a parent process, when the server runs in a child one
+        self.shared = shared
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = json.loads(await reader.readexactly(int(headers.get("content-length", 0))) or b"{}")
+
+                self.requests += 1
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                if self.shared is not None:
+                    self.shared.record(self.in_flight)
+                try:
+                    await asyncio.sleep(self.latency)
+                    text = completion_text(body)
+                    if body.get("stream"):
+                        await self.send_stream(writer, body, text)
+                        break
+                    payload = json.dumps(completion(body, text)).encode()
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                        + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                        + payload
+                    )
+                    await writer.drain()
+                finally:
+                    self.in_flight -= 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def send_stream(self, writer, body, text):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nConnection: close\r\n\r\n")
+        for word in text.split(" "):
+            writer.write(f"data: {json.dumps(chunk(body, {'content': word + ' '}))}\n\n".encode())
+            await writer.drain()
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+        writer.write(f"data: {json.dumps(chunk(body, {}, 'stop'))}\n\ndata: [DONE]\n\n".encode())
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=0):
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        return server, server.sockets[0].getsockname()[1]
+
+
+def start_in_thread(latency=0.5, chunk_delay=0.0, host="127.0.0.1", port=0):
+    """Run a FakeLLMServer on its own event loop thread; returns (server, base_url)."""
+    fake = FakeLLMServer(latency, chunk_delay)
+    started = threading.Event()
+    address = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _, address["port"] = loop.run_until_complete(fake.serve(host, port))
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="fake-llm", daemon=True).start()
+    started.wait()
+    return fake, f"http://{host}:{address['port']}/v1"
+
+
+class SharedStats:
+    """Request counters shared with the process that started the server; either side may reset them."""
+
+    def __init__(self):
+        self._requests = multiprocessing.Value("i", 0)
+        self._max_in_flight = multiprocessing.Value("i", 0)
+
+    def record(self, in_flight):
+        with self._requests.get_lock():
+            self._requests.value += 1
+            self._max_in_flight.value = max(self._max_in_flight.value, in_flight)
+
+    def reset(self):
+        with self._requests.get_lock():
+            self._requests.value = 0
+            self._max_in_flight.value = 0
+
+    @property
+    def requests(self):
+        return self._requests.value
+
+    @property
+    def max_in_flight(self):
+        return self._max_in_flight.value
+
+
+def _serve_in_process(latency, chunk_delay, host, port, shared, ready):
+    async def main():
+        server, bound_port = await FakeLLMServer(latency, chunk_delay, shared).serve(host, port)
+        ready.send(bound_port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def start_in_process(latency=0.5, chunk_delay=0.0, host="127.0.0.1", port=0):
+    """Run a FakeLLMServer in a child process, so it does not compete with the caller for the GIL.
+
+    Returns (process, stats, base_url); ``stats`` is a SharedStats of the
+    server's requests.
+    """
+    shared = SharedStats()
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_serve_in_process, args=(latency, chunk_delay, host, port, shared, sender), name="fake-llm", daemon=True,
+    )
+    process.start()
+    bound_port = receiver.recv()
+    return process, shared, f"http://{host}:{bound_port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before each completion starts")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    async def main():
+        server, port = await FakeLLMServer(args.latency, args.chunk_delay).serve(args.host, args.port)
+        print(f"Fake LLM listening on http://{args.host}:{port}/v1")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""Concurrency load test of the chat pipeline against the fake LLM server.
+
+Starts benchmarks/fake_llm.py in a child process, so it does not share the
+GIL with the app, then drives complete first-turn chats (parse call,
+filtering, response call) at increasing concurrency, each chat in its own
+session. The message is too vague for the local fast parse, so every chat
+makes both model calls; ``calls/chat`` reports what the server saw.
+``--mode async`` uses agenerate_response on one event loop; ``--mode sync``
+runs generate_response on ``--sync-workers`` threads to show what the same
+number of blocking WSGI workers would sustain::
+
+    python benchmarks/load_async.py --latency 0.5 --concurrency 1 10 100 400
+
+Throughput grows with concurrency until the app process is CPU-bound; past
+that point more chats in flight only add queueing to their latency.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._stats import percentile
+from benchmarks.fake_llm import start_in_process
+
+# Too vague for intent_parser.parse_locally, so the parse goes to the model
+MESSAGE = "a laptop for my dad who mostly reads the news"
+
+
+async def run_async(chatbot, concurrency, chats, run_id):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_chat(i):
+        async with semaphore:
+            start = time.perf_counter()
+            # Unique message per chat so the parse cache never answers
+            await chatbot.agenerate_response(f"{MESSAGE} {run_id}-{i}", session_id=f"load-{run_id}-{i}")
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one_chat(i) for i in range(chats)))
+    return latencies
+
+
+def run_sync(chatbot, workers, chats, run_id):
+    latencies = []
+
+    def one_chat(i):
+        start = time.perf_counter()
+        chatbot.generate_response(f"{MESSAGE} {run_id}-{i}", session_id=f"load-{run_id}-{i}")
+        latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one_chat, range(chats)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["async", "sync"], default="async")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM latency per call, in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 200, 400])
+    parser.add_argument("--chats-per-level", type=int, default=2, help="chats per level, as a multiple of concurrency")
+    parser.add_argument("--sync-workers", type=int, default=1, help="blocking workers in sync mode")
+    args = parser.parse_args()
+
+    fake, stats, base_url = start_in_process(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    import chatbot
+
+    print(f"mode={args.mode} fake LLM latency={args.latency}s ({base_url})")
+    print(f"{'concurrency':>11} {'chats':>6} {'chats/s':>8} {'p50 s':>7} {'p95 s':>7} {'calls/chat':>10} "
+          f"{'upstream peak':>13}")
+
+    async def levels():
+        # One event loop for every level: the model's HTTP client is bound to it
+        for run_id, concurrency in enumerate(args.concurrency):
+            chats = max(concurrency * args.chats_per_level, 10)
+            stats.reset()
+            start = time.perf_counter()
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                if args.mode == "async":
+                    latencies = await run_async(chatbot, concurrency, chats, run_id)
+                else:
+                    latencies = await asyncio.to_thread(run_sync, chatbot, args.sync_workers, chats, run_id)
+            elapsed = time.perf_counter() - start
+            print(f"{concurrency:>11} {chats:>6} {chats / elapsed:>8.1f} {statistics.median(latencies):>7.2f} "
+                  f"{percentile(latencies, 95):>7.2f} {stats.requests / chats:>10.1f} {stats.max_in_flight:>13}")
+
+    try:
+        asyncio.run(levels())
+    finally:
+        fake.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Replay recorded conversations against the Flask app and report throughput and latency.
+
+Each line of the conversations file is a JSON object with a ``turns`` list of
+user messages (or a single ``message``) and an optional ``top_k``. Every
+conversation is sent ``--repeat`` times, each time in a new session, with
+``--concurrency`` conversations in flight; turns within a conversation are
+sent in order.
+
+By default the app runs in-process with the replay model backend
+(``LLM_BACKEND=replay``), answering from ``--recordings`` (written by running
+the app with ``LLM_RECORD_PATH``) after ``--latency`` seconds, so no network
+access is needed::
+
+    python benchmarks/replay_load.py benchmarks/conversations.jsonl --concurrency 8 --repeat 20
+    python benchmarks/replay_load.py convs.jsonl --recordings recordings.jsonl --latency 0.5 --stream
+    python benchmarks/replay_load.py convs.jsonl --url http://127.0.0.1:5000   # a running server
+
+Exits with status 1 when throughput falls below ``--min-throughput`` or p95
+latency exceeds ``--max-p95``.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks._stats import percentile
+
+
+def read_conversations(path):
+    conversations = []
+    with open(path, encoding='utf-8') as handle:
+        for number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            turns = record.get('turns') or ([record['message']] if 'message' in record else [])
+            if not turns:
+                raise ValueError(f"{path}:{number}: no 'turns' or 'message'")
+            conversations.append({'turns': turns, 'top_k': record.get('top_k')})
+    return conversations
+
+
+class InProcessClient:
+    """Sends requests through the Flask test client, one client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def post(self, path, body, session_id):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.post(path, json=body, headers={'X-Session-ID': session_id})
+        response.get_data()
+        return response.status_code
+
+
+class HttpClient:
+    """Sends requests to a running server."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def post(self, path, body, session_id):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(body).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'X-Session-ID': session_id},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def replay(client, conversations, concurrency, repeat, stream):
+    """Run every conversation ``repeat`` times; returns (request latencies, errors, elapsed seconds)."""
+    path = '/chat/stream' if stream else '/chat'
+    run_id = f"{os.getpid()}{int(time.time())}"
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def one_conversation(job):
+        number, conversation = job
+        session_id = f"replay-{run_id}-{number}"
+        for message in conversation['turns']:
+            body = {'message': message}
+            if conversation['top_k'] is not None:
+                body['top_k'] = conversation['top_k']
+            start = time.perf_counter()
+            try:
+                status = client.post(path, body, session_id)
+            except OSError as e:
+                status = str(e)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if status != 200:
+                    errors.append(status)
+
+    jobs = list(enumerate(conversations * repeat))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_conversation, jobs))
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("conversations", help="JSONL file of conversations")
+    parser.add_argument("--concurrency", type=int, default=8, help="conversations in flight")
+    parser.add_argument("--repeat", type=int, default=10, help="times each conversation is replayed")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream instead of /chat")
+    parser.add_argument("--url", help="base URL of a running server instead of the in-process app")
+    parser.add_argument("--recordings", help="recorded model outputs (LLM_RECORD_PATH) to replay")
+    parser.add_argument("--latency", type=float, default=0.0, help="replayed model latency per call, in seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between replayed stream chunks")
+    parser.add_argument("--no-parse-cache", action="store_true", help="disable the in-process parse cache")
+    parser.add_argument("--output", help="also write the results as JSON here")
+    parser.add_argument("--min-throughput", type=float, help="fail below this many requests per second")
+    parser.add_argument("--max-p95", type=float, help="fail above this p95 latency, in seconds")
+    args = parser.parse_args()
+
+    conversations = read_conversations(args.conversations)
+    if args.url:
+        client = HttpClient(args.url)
+    else:
+        os.environ["LLM_BACKEND"] = "replay"
+        os.environ["LLM_REPLAY_LATENCY"] = str(args.latency)
+        os.environ["LLM_REPLAY_CHUNK_DELAY"] = str(args.chunk_delay)
+        if args.recordings:
+            os.environ["LLM_REPLAY_PATH"] = args.recordings
+        if args.no_parse_cache:
+            os.environ["PARSE_CACHE_SIZE"] = "0"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        from app import app
+        client = InProcessClient(app)
+
+    latencies, errors, elapsed = replay(client, conversations, args.concurrency, args.repeat, args.stream)
+    results = {
+        'target': args.url or 'in-process',
+        'endpoint': '/chat/stream' if args.stream else '/chat',
+        'concurrency': args.concurrency,
+        'conversations': len(conversations) * args.repeat,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_s': percentile(latencies, 50),
+        'p95_s': percentile(latencies, 95),
+        'p99_s': percentile(latencies, 99),
+    }
+    if not args.url:
+        import chatbot
+        replayed = getattr(chatbot.model, 'hits', None)
+        if replayed is not None:
+            results['replay_hits'] = chatbot.model.hits
+            results['replay_misses'] = chatbot.model.misses
+        results['model_calls'] = chatbot.llm_flights.calls
+        results['coalesced_calls'] = chatbot.llm_flights.coalesced
+
+    print(f"{results['requests']} requests ({results['conversations']} conversations) to {results['target']} "
+          f"{results['endpoint']} at concurrency {args.concurrency} in {elapsed:.1f}s")
+    print(f"throughput {results['throughput']:.1f} req/s  p50 {results['p50_s']:.3f}s  "
+          f"p95 {results['p95_s']:.3f}s  p99 {results['p99_s']:.3f}s  errors {results['errors']}")
+    if 'replay_hits' in results:
+        print(f"replayed model outputs: {results['replay_hits']} recorded, {results['replay_misses']} defaults")
+    if 'coalesced_calls' in results:
+        print(f"model calls: {results['model_calls']} made, {results['coalesced_calls']} coalesced into identical calls in flight")
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+
+    failed = bool(errors)
+    if args.min_throughput is not None and results['throughput'] < args.min_throughput:
+        print(f"FAIL: throughput below {args.min_throughput} req/s")
+        failed = True
+    if args.max_p95 is not None and results['p95_s'] > args.max_p95:
+        print(f"FAIL: p95 latency above {args.max_p95}s")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Cold start benchmark: import time breakdown and time until a worker is ready.
+
+Starts ``--runs`` fresh interpreters that import ``app`` under ``-X importtime``
+and then run each warm-up step (``catalogues.load()``, ``llm_chains()``) with
+the replay model backend, so no network access or API key is needed. Reports
+the median import time of ``app`` and of the modules it imports, the warm-up
+steps and the total time to ready, writes the results as JSON and compares
+them with a stored baseline::
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --depth 3
+    python benchmarks/startup.py --save-baseline
+
+Exits with status 1 when a step is slower than the baseline by more than
+``--tolerance``, or when importing ``app`` loads one of ``HEAVY_MODULES``,
+which should only be loaded by the warm-up.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, 'results', 'startup.json')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'startup_baseline.json')
+
+# Packages that take long to import and are only needed once the chains are built or a CSV is compiled
+HEAVY_MODULES = ['pandas', 'langchain', 'langchain_core', 'langchain_openai', 'openai', 'langsmith', 'langchain_text_splitters']
+
+# Timed steps, compared with the baseline
+STEPS = ['import', 'catalogue', 'chains', 'ready']
+
+# Runs in each fresh interpreter; prints the step timings as JSON on the last line of stdout
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+import chatbot
+chatbot.catalogues.load()
+loaded = time.perf_counter()
+chatbot.llm_chains()
+ready = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start, 'catalogue': loaded - imported, 'chains': ready - loaded, 'ready': ready - start,
+    'heavy': heavy,
+}}))
+"""
+
+
+def parse_importtime(stderr, depth):
+    """Cumulative import seconds of ``app`` and the modules under it, down to ``depth`` levels below it.
+
+    ``-X importtime`` lists a module after everything it imported, so the
+    lines since the previous top-level module belong to ``app``.
+    """
+    pending = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level <= depth:
+            pending[name.strip()] = int(cumulative) / 1e6
+        if level == 0:
+            if name.strip() == 'app':
+                return pending
+            pending = {}
+    return {}
+
+
+def probe(depth):
+    """One cold start: (step seconds, module import seconds, heavy modules loaded by the import)."""
+    environment = dict(os.environ, LLM_BACKEND='replay', WARM_UP='0', LOG_LEVEL='WARNING')
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=ROOT_DIR, env=environment, capture_output=True, text=True, check=True,
+    )
+    steps = json.loads(completed.stdout.strip().splitlines()[-1])
+    return steps, parse_importtime(completed.stderr, depth), steps.pop('heavy')
+
+
+def run(runs, depth):
+    timings = {step: [] for step in STEPS}
+    modules = {}
+    heavy = set()
+    for _ in range(runs):
+        steps, imported, loaded = probe(depth)
+        for step in STEPS:
+            timings[step].append(steps[step])
+        for name, seconds in imported.items():
+            modules.setdefault(name, []).append(seconds)
+        heavy.update(loaded)
+
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'runs': runs,
+        },
+        'results': [
+            {'step': step, 'median_ms': statistics.median(values) * 1000, 'max_ms': max(values) * 1000}
+            for step, values in timings.items()
+        ],
+        'imports': sorted(
+            ({'module': name, 'median_ms': statistics.median(values) * 1000} for name, values in modules.items()),
+            key=lambda entry: -entry['median_ms'],
+        ),
+        'heavy_modules': sorted(heavy),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each step against the baseline; returns the number of regressions."""
+    reference = {entry['step']: entry for entry in baseline['results']}
+    regressions = 0
+    print(f"\nagainst baseline of {baseline['meta']['created']} (tolerance {tolerance:.2f}x)")
+    print(f"{'step':<10} {'median ratio':>12}")
+    for entry in results['results']:
+        before = reference.get(entry['step'])
+        if before is None:
+            continue
+        ratio = entry['median_ms'] / before['median_ms'] if before['median_ms'] else 1.0
+        regressed = ratio > tolerance
+        regressions += regressed
+        print(f"{entry['step']:<10} {ratio:>11.2f}x{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to take the median of")
+    parser.add_argument("--depth", type=int, default=2, help="module levels below app in the import breakdown")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to print")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="results JSON (default: %(default)s)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="median slowdown counted as a regression")
+    args = parser.parse_args()
+
+    results = run(args.runs, args.depth)
+
+    print(f"{'step':<10} {'median ms':>10} {'max ms':>10}")
+    for entry in results['results']:
+        print(f"{entry['step']:<10} {entry['median_ms']:>10.1f} {entry['max_ms']:>10.1f}")
+    print(f"\nslowest imports (cumulative, up to {args.depth} levels below app)")
+    for entry in results['imports'][:args.top]:
+        print(f"{entry['median_ms']:>10.1f} ms  {entry['module']}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    failed = False
+    if results['heavy_modules']:
+        print(f"FAIL: importing app loaded {', '.join(results['heavy_modules'])}")
+        failed = True
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 1 if failed else 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; store one with --save-baseline")
+        return 1 if failed else 0
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    return 1 if compare(results, baseline, args.tolerance) or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,582 @@
+"""Compiled, memory-mapped and versioned laptop catalogue.
+
+Build or check it with ``python -m catalogue build`` / ``python -m catalogue validate``.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialised across processes
+    fcntl = None
+
+import numpy as np
+
+# pandas is only needed to compile a catalogue from the CSV, so it is imported
+# there; serving a compiled catalogue does not pay for importing it
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+CSV_PATH = os.path.join(DATA_DIR, 'CleanedLaptopData.csv')
+CATALOGUE_DIR = os.path.join(DATA_DIR, 'catalogue')
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+
+# Each build is an immutable directory named after its version; CURRENT names
+# the version workers should serve, and the newest KEEP_VERSIONS are kept
+CURRENT = 'CURRENT'
+KEEP_VERSIONS = 3
+
+PRICE = 'Price (in Indian Rupees)'
+RAM = 'RAM (in GB)'
+STORAGE = 'Storage'
+PERFORMANCE = 'Performance_Score'
+PORTABILITY = 'Portability'
+GPU_MEMORY = 'Dedicated Graphic Memory Capacity'
+GPU_BENCHMARK = 'gpu_benchmark'
+CPU_RANKING = 'CPU_ranking'
+
+# Row identifier from the source dataset; unlike row positions it is stable across versions
+LAPTOP_ID = 'index'
+
+# Derived at load time by add_derived_columns
+CPU_FAMILY = 'cpu_family'
+CPU_TIER = 'cpu_tier'
+
+# Processor families stored in CPU_FAMILY
+CPU_OTHER = 0
+CPU_INTEL_CORE = 1
+CPU_AMD_RYZEN = 2
+CPU_APPLE_M = 3
+
+# Numeric columns served by the range index
+INDEXED_COLUMNS = [PRICE, RAM, STORAGE, PERFORMANCE, PORTABILITY, GPU_MEMORY, CPU_FAMILY, CPU_TIER]
+
+# Text columns, only read for the rows being displayed
+STRING_COLUMNS = ['name', 'Processor name', 'gpu name ', 'link']
+
+# CSV bookkeeping columns that are not catalogue data
+SKIPPED_COLUMNS = ['Unnamed: 0']
+
+
+def classify_processor(name: str) -> Tuple[int, int]:
+    """Map a processor name to its (family, tier) codes, e.g. 'intel core i7' -> (CPU_INTEL_CORE, 7)."""
+    name = name.lower()
+    if 'ryzen' in name:
+        match = re.search(r'ryzen\s*(\d)', name)
+        return CPU_AMD_RYZEN, int(match.group(1)) if match else 0
+    for tier in (3, 5, 7, 9):
+        if f'i{tier}' in name:
+            return CPU_INTEL_CORE, tier
+    match = re.search(r'\bm(\d)\b', name)
+    if match:
+        return CPU_APPLE_M, 9 if ('pro' in name or 'max' in name) else 7
+    return CPU_OTHER, 0
+
+def add_derived_columns(frame: 'pd.DataFrame') -> 'pd.DataFrame':
+    """Add the CPU family and tier columns used for filtering and ranking."""
+    import pandas as pd
+
+    # Only a handful of distinct processor names, so classify each one once
+    codes, names = pd.factorize(frame['Processor name'])
+    classes = np.array([classify_processor(name) for name in names], dtype=np.int64).reshape(-1, 2)
+    frame[CPU_FAMILY] = classes[codes, 0]
+    frame[CPU_TIER] = classes[codes, 1]
+    return frame
+
+def build_config_signatures(frame: 'pd.DataFrame') -> np.ndarray:
+    """Hash the normalised (processor, RAM, storage, GPU, screen) key of every row."""
+    import pandas as pd
+
+    signature_columns = pd.DataFrame({
+        'processor': frame['Processor name'].str.lower(),
+        'ram': frame[RAM],
+        'storage': frame[STORAGE],
+        'gpu': frame['gpu name '].str.strip().str.lower().fillna("integrated"),
+        'screen_size': frame['Screen Size (in inch)'],
+    })
+    return pd.util.hash_pandas_object(signature_columns, index=False).to_numpy()
+
+
+class StringColumn:
+    """UTF-8 strings packed end to end, with ``offsets[i]:offsets[i + 1]`` locating row ``i``."""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_values(cls, values) -> 'StringColumn':
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def take(self, positions) -> List[str]:
+        offsets, data = self.offsets, self.data
+        return [bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in positions]
+
+    def first_words(self, width: int = 16) -> np.ndarray:
+        """The first space-separated word of every row as ``S{width}`` bytes, cut at ``width``.
+
+        Only the first ``width`` bytes of each row are read, and none is decoded.
+        """
+        starts, ends = self.offsets[:-1], self.offsets[1:]
+        words = np.zeros((len(starts), width), dtype=np.uint8)
+        rows = np.arange(len(starts))
+        for i in range(width):
+            # Rows whose first word is still going at byte i
+            rows = rows[starts[rows] + i < ends[rows]]
+            chars = self.data[starts[rows] + i]
+            rows, chars = rows[chars != ord(' ')], chars[chars != ord(' ')]
+            words[rows, i] = chars
+        return words.view(f'S{width}').ravel()
+
+
+class Catalogue:
+    """Column store of the laptop dataset.
+
+    Numeric columns are float64 arrays, text columns are StringColumns, and
+    ``signatures`` holds the configuration hash of every row. Opened from a
+    compiled directory all of them are memory-mapped; ``orders`` then also
+    carries the precomputed sort order of each indexed column.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], strings: Dict[str, StringColumn], signatures: np.ndarray,
+                 orders: Optional[Dict[str, np.ndarray]] = None, version: Optional[str] = None):
+        self.columns = columns
+        self.strings = strings
+        self.signatures = signatures
+        self.orders = orders or {}
+        self.version = version
+        self.size = len(signatures)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def text(self, name: str, positions) -> List[str]:
+        return self.strings[name].take(positions)
+
+    @classmethod
+    def from_frame(cls, frame: 'pd.DataFrame') -> 'Catalogue':
+        """Build an in-memory catalogue from a frame that already has the derived columns."""
+        import pandas as pd
+
+        frame = frame.drop(columns=[column for column in SKIPPED_COLUMNS if column in frame])
+        columns = {
+            column: frame[column].to_numpy(dtype=np.float64)
+            for column in frame.columns
+            if column not in STRING_COLUMNS and pd.api.types.is_numeric_dtype(frame[column])
+        }
+        strings = {
+            column: StringColumn.from_values(frame[column].str.strip().fillna('') if column == 'gpu name '
+                                             else frame[column].astype(str))
+            for column in STRING_COLUMNS
+        }
+        return cls(columns, strings, build_config_signatures(frame))
+
+    @classmethod
+    def open(cls, directory: str = CATALOGUE_DIR) -> 'Catalogue':
+        """Memory-map a catalogue compiled by ``write``."""
+        manifest = read_manifest(directory)
+
+        def load(file_name):
+            # A plain ndarray view of the map: slicing np.memmap objects is markedly slower
+            return np.asarray(np.load(os.path.join(directory, file_name), mmap_mode='r'))
+
+        columns = {column: load(entry['file']) for column, entry in manifest['columns'].items()}
+        strings = {
+            column: StringColumn(load(entry['offsets']), load(entry['data']))
+            for column, entry in manifest['strings'].items()
+        }
+        orders = {column: load(file_name) for column, file_name in manifest['orders'].items()}
+        return cls(columns, strings, load(manifest['signatures']), orders, manifest.get('version'))
+
+    def write(self, directory: str, source: Optional[Dict] = None, version: Optional[str] = None,
+              indexed: List[str] = INDEXED_COLUMNS) -> None:
+        """Compile the catalogue into ``directory``; an existing build there is left untouched."""
+        staging = f'{directory}.tmp-{os.getpid()}'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        def save(file_name, array):
+            np.save(os.path.join(staging, file_name), np.ascontiguousarray(array))
+            return file_name
+
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'version': version,
+            'rows': self.size,
+            'source': source,
+            'columns': {},
+            'strings': {},
+            'orders': {},
+            'signatures': save('config_signature.npy', self.signatures),
+        }
+        for column, values in self.columns.items():
+            manifest['columns'][column] = {'file': save(f'{_slug(column)}.npy', values), 'dtype': str(values.dtype)}
+        for column, values in self.strings.items():
+            manifest['strings'][column] = {
+                'offsets': save(f'{_slug(column)}.offsets.npy', values.offsets),
+                'data': save(f'{_slug(column)}.data.npy', values.data),
+            }
+        for column in indexed:
+            order = np.argsort(self.columns[column], kind='stable')
+            manifest['orders'][column] = save(f'{_slug(column)}.order.npy', order)
+
+        with open(os.path.join(staging, MANIFEST), 'w') as handle:
+            json.dump(manifest, handle, indent=2)
+
+        # Move the finished build in; a concurrent builder may have won the race
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def _slug(column: str) -> str:
+    return re.sub(r'\W+', '_', column).strip('_').lower()
+
+def read_manifest(directory: str) -> Dict:
+    with open(os.path.join(directory, MANIFEST)) as handle:
+        manifest = json.load(handle)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported catalogue format {manifest.get('format_version')} in {directory}")
+    return manifest
+
+def describe_source(csv_path: str, with_hash: bool = True) -> Dict:
+    stat = os.stat(csv_path)
+    source = {'path': os.path.basename(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(csv_path, 'rb') as handle:
+            for block in iter(lambda: handle.read(1 << 20), b''):
+                digest.update(block)
+        source['sha256'] = digest.hexdigest()
+    return source
+
+def read_csv(csv_path: str = CSV_PATH) -> 'pd.DataFrame':
+    import pandas as pd
+
+    return add_derived_columns(pd.read_csv(csv_path))
+
+def version_name(source: Dict) -> str:
+    """Name a build after its source file, e.g. '20250717T093000-1a2b3c4d' (mtime, then content hash)."""
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(source['mtime_ns'] / 1e9))
+    return f"{stamp}-{source['sha256'][:8]}"
+
+def current_version(root: str = CATALOGUE_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(root, CURRENT)) as handle:
+            return handle.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def list_versions(root: str = CATALOGUE_DIR) -> List[str]:
+    """Complete builds under ``root``, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.isfile(os.path.join(root, name, MANIFEST)))
+
+def publish(root: str, version: str) -> None:
+    """Point CURRENT at ``version``; readers see either the old or the new name, never a partial one."""
+    staging = os.path.join(root, f'{CURRENT}.tmp-{os.getpid()}')
+    with open(staging, 'w') as handle:
+        handle.write(version)
+    os.replace(staging, os.path.join(root, CURRENT))
+
+def prune(root: str = CATALOGUE_DIR, keep: int = KEEP_VERSIONS) -> None:
+    """Delete all but the newest ``keep`` builds and the current one.
+
+    Workers still serving a deleted build are unaffected: their memory maps
+    keep the files alive until they switch to a newer version.
+    """
+    active = current_version(root)
+    for version in list_versions(root)[:-keep or None]:
+        if version != active:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+@contextlib.contextmanager
+def build_lock(root: str, blocking: bool = True):
+    """Serialise builds across processes; yields False when ``blocking`` is off and another build holds it."""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.build.lock'), 'w') as handle:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+def build(csv_path: str = CSV_PATH, root: str = CATALOGUE_DIR, keep: int = KEEP_VERSIONS) -> str:
+    """Compile ``csv_path`` into a new version under ``root``, make it current and return its name."""
+    source = describe_source(csv_path)
+    version = version_name(source)
+    directory = os.path.join(root, version)
+    if not os.path.isfile(os.path.join(directory, MANIFEST)):
+        Catalogue.from_frame(read_csv(csv_path)).write(directory, source, version)
+    publish(root, version)
+    prune(root, keep)
+    return version
+
+def open_version(root: str = CATALOGUE_DIR, version: Optional[str] = None) -> Catalogue:
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No catalogue has been published in {root}")
+    return Catalogue.open(os.path.join(root, version))
+
+def is_stale(root: str = CATALOGUE_DIR, csv_path: str = CSV_PATH) -> bool:
+    """True when no catalogue is published or the current one was built from an older CSV."""
+    version = current_version(root)
+    if version is None:
+        return True
+    try:
+        source = read_manifest(os.path.join(root, version))['source'] or {}
+    except (OSError, ValueError):
+        return True
+    current = describe_source(csv_path, with_hash=False)
+    return source.get('size') != current['size'] or source.get('mtime_ns') != current['mtime_ns']
+
+
+class Snapshot:
+    """One catalogue version together with the structures prepared from it.
+
+    Snapshots are never modified; callers that hold one keep a consistent
+    view of the data even after a newer version has been swapped in.
+    """
+
+    __slots__ = ('version', 'catalogue', 'index')
+
+    def __init__(self, catalogue: Catalogue, index=None):
+        self.version = catalogue.version
+        self.catalogue = catalogue
+        self.index = index
+
+
+class CatalogueManager:
+    """Serve the current catalogue snapshot and hot-swap newer versions in.
+
+    Every ``refresh_interval`` seconds ``current()`` checks whether another
+    process published a new version (or whether the CSV changed, in which case
+    one process rebuilds it in the background) and, if so, opens it and swaps
+    it in with a single reference assignment. ``prepare`` derives the extra
+    per-version structures, such as the range index, stored in ``Snapshot.index``.
+
+    Nothing is opened until the first ``current()`` call, or an earlier
+    ``load()`` from a warm-up hook, so creating a manager is free.
+    """
+
+    def __init__(self, root: str = CATALOGUE_DIR, csv_path: str = CSV_PATH,
+                 prepare: Optional[Callable[[Catalogue], object]] = None, refresh_interval: float = 5.0,
+                 keep: int = KEEP_VERSIONS):
+        self.root = root
+        self.csv_path = csv_path
+        self.prepare = prepare
+        self.refresh_interval = refresh_interval
+        self.keep = keep
+        self.swaps = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._next_check = time.monotonic() + refresh_interval
+        self._csv_stat = None
+        self._building = False
+        self._snapshot = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def current(self) -> Snapshot:
+        if self._snapshot is None:
+            return self.load()
+        if self.refresh_interval > 0 and time.monotonic() >= self._next_check:
+            self.refresh()
+        return self._snapshot
+
+    def load(self) -> Snapshot:
+        """Open the current version, compiling it first if needed, unless one is already being served."""
+        with self._load_lock:
+            if self._snapshot is None:
+                self._snapshot = self._load()
+                self._next_check = time.monotonic() + self.refresh_interval
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Swap in the published version if it is newer than the one being served; True when swapped."""
+        if self._snapshot is None:
+            # Not loaded yet; load() opens whichever version is current then
+            return False
+        if not self._lock.acquire(blocking=False):
+            # Another thread is already checking; keep serving the current snapshot
+            return False
+        try:
+            self._next_check = time.monotonic() + self.refresh_interval
+            if self._csv_changed() and not self._building:
+                self._building = True
+                threading.Thread(target=self._rebuild, name='catalogue-build', daemon=True).start()
+
+            version = current_version(self.root)
+            if version is None or version == self._snapshot.version:
+                return False
+            self._snapshot = self._snapshot_of(open_version(self.root, version))
+            self.swaps += 1
+            logger.info("Catalogue version %s is now being served", version)
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Could not refresh the catalogue: %s", e)
+            return False
+        finally:
+            self._lock.release()
+
+    def _load(self) -> Snapshot:
+        try:
+            if os.path.exists(self.csv_path):
+                self._csv_stat = self._stat_csv()
+                with build_lock(self.root):
+                    # The first worker to start compiles; the rest find it built
+                    if is_stale(self.root, self.csv_path):
+                        build(self.csv_path, self.root, self.keep)
+            return self._snapshot_of(open_version(self.root))
+        except OSError as e:
+            logger.warning("Could not compile the catalogue (%s); loading the CSV into memory", e)
+            catalogue = Catalogue.from_frame(read_csv(self.csv_path))
+            catalogue.version = 'memory-' + version_name(describe_source(self.csv_path))
+            return self._snapshot_of(catalogue)
+
+    def _snapshot_of(self, catalogue: Catalogue) -> Snapshot:
+        return Snapshot(catalogue, self.prepare(catalogue) if self.prepare else None)
+
+    def _stat_csv(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _csv_changed(self) -> bool:
+        stat = self._stat_csv()
+        if stat is None or stat == self._csv_stat:
+            return False
+        self._csv_stat = stat
+        return True
+
+    def _rebuild(self) -> None:
+        try:
+            with build_lock(self.root, blocking=False) as acquired:
+                if acquired and is_stale(self.root, self.csv_path):
+                    version = build(self.csv_path, self.root, self.keep)
+                    logger.info("Catalogue version %s built from %s", version, self.csv_path)
+        except Exception as e:
+            logger.warning("Could not rebuild the catalogue: %s", e)
+        finally:
+            self._building = False
+            # Pick the new version up on the next request
+            self._next_check = 0.0
+
+
+def validate(root: str = CATALOGUE_DIR, csv_path: Optional[str] = CSV_PATH,
+             version: Optional[str] = None) -> List[str]:
+    """Check a compiled version (default: the current one) for consistency and against the CSV.
+
+    Returns the problems found.
+    """
+    try:
+        catalogue = open_version(root, version)
+        manifest = read_manifest(os.path.join(root, catalogue.version))
+    except (OSError, ValueError, KeyError) as e:
+        return [f"cannot open catalogue: {e}"]
+
+    problems = []
+    rows = manifest['rows']
+    for column, values in catalogue.columns.items():
+        if len(values) != rows:
+            problems.append(f"column {column!r} has {len(values)} rows, expected {rows}")
+        elif np.isnan(values).any():
+            problems.append(f"column {column!r} contains NaN")
+    for column, values in catalogue.strings.items():
+        if len(values) != rows or values.offsets[-1] != len(values.data) or (np.diff(values.offsets) < 0).any():
+            problems.append(f"string column {column!r} has inconsistent offsets")
+    for column, order in catalogue.orders.items():
+        values = catalogue.columns[column]
+        if len(order) != rows or (np.diff(values[order]) < 0).any():
+            problems.append(f"sort order of {column!r} does not sort the column")
+    if len(catalogue.signatures) != rows:
+        problems.append(f"{len(catalogue.signatures)} signatures, expected {rows}")
+
+    if csv_path:
+        source = describe_source(csv_path)
+        if (manifest['source'] or {}).get('sha256') != source['sha256']:
+            problems.append(f"catalogue was not built from the current {source['path']}")
+        else:
+            expected = Catalogue.from_frame(read_csv(csv_path))
+            for column, values in expected.columns.items():
+                if column not in catalogue.columns or not np.array_equal(catalogue.columns[column], values):
+                    problems.append(f"column {column!r} differs from the CSV")
+            for column, values in expected.strings.items():
+                if column not in catalogue.strings or values.take(range(rows)) != catalogue.text(column, range(rows)):
+                    problems.append(f"string column {column!r} differs from the CSV")
+            if not np.array_equal(catalogue.signatures, expected.signatures):
+                problems.append("configuration signatures differ from the CSV")
+
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build, validate or list the compiled laptop catalogue versions.")
+    parser.add_argument('command', choices=['build', 'validate', 'list'])
+    parser.add_argument('--csv', default=CSV_PATH, help="source CSV (default: %(default)s)")
+    parser.add_argument('--out', default=CATALOGUE_DIR, help="catalogue directory (default: %(default)s)")
+    parser.add_argument('--version', help="version to validate (default: the current one)")
+    parser.add_argument('--keep', type=int, default=KEEP_VERSIONS, help="builds to keep (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        with build_lock(args.out):
+            version = build(args.csv, args.out, args.keep)
+        catalogue = open_version(args.out, version)
+        print(f"Published {version}: {catalogue.size} rows, {len(catalogue.columns)} numeric "
+              f"and {len(catalogue.strings)} text columns")
+        return 0
+
+    if args.command == 'list':
+        active = current_version(args.out)
+        for version in list_versions(args.out):
+            print(f"{'*' if version == active else ' '} {version}")
+        return 0
+
+    problems = validate(args.out, args.csv, args.version)
+    for problem in problems:
+        print(f"ERROR: {problem}")
+    if not problems:
+        print(f"{args.version or current_version(args.out)} is valid")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,359 +1,827 @@
-import os
-import json
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.schema.output_parser import StrOutputParser
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_core.chat_history import InMemoryChatMessageHistory, BaseChatMessageHistory
-from recommendation import filter_laptops
-from pydantic import SecretStr
-
-load_dotenv(override=True)
-
-# Model
-api_key = SecretStr(os.getenv("OPENAI_API_KEY"))
-if not api_key:
-    raise Exception("OpenAI API key not set")
-
-model = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.4,
-    api_key=api_key,
-)
-
-def strip_backticks(code):
-    if code.startswith("```") and code.endswith("```"):
-        code = code[3:]
-        first_newline_index = code.find("\n")
-        if first_newline_index != -1:
-            code = code[first_newline_index + 1:]
-        code = code.rstrip("`")
-    return code
-
-knowledge_base = """
-    You are an advanced laptop recommendation expert with deep knowledge of computer hardware and user requirements. Your task is to analyze user queries and convert them into a structured JSON format that captures both explicit requirements and implicit needs based on use cases.
-
-    **Core Responsibilities:**
-    1. Convert user requirements into specific technical specifications
-    2. Infer appropriate performance and portability ranges based on use cases
-    3. Set reasonable price ranges based on requirements
-    4. Handle both technical and non-technical user queries
-    5. We have Max RAM size of 32 in dataset, Storage of 1024.
-    6. Screen Size we have are 13.3, 14.0, 15.6, 16.1, 17.3
-    7. For Desktop replacement strictly keep portability upper range till 50
-    8. The price in the dataset ranges from 15990 to 301990, if lower limit is provided set upper limit the highest and vice versa.
-
-    **Use Case Mappings:**
-
-    1. "Student/Basic Use" (Web browsing, documents, basic multitasking):
-    {
-        "specifications": {
-            "RAM (in GB)": 8,
-            "Storage": "256",
-            "Screen Size (in inch)": 14.0,
-            "dedicated_graphics": false
-        },
-        "price_range": {
-            "min": 30000,
-            "max": 60000
-        },
-        "performance_range": {
-            "min": 30,
-            "max": 75
-        },
-        "portability_range": {
-            "min": 60,
-            "max": 100
-        }
-    }
-
-    2. "Gaming" (High-performance gaming, streaming):
-    {
-        "specifications": {
-            "RAM (in GB)": 16,
-            "Storage": "512",
-            "Screen Size (in inch)": 15.6,
-            "processor_min": "i5",
-            "dedicated_graphics": true
-        },
-        "price_range": {
-            "min": 80000,
-            "max": 301990
-        },
-        "performance_range": {
-            "min": 80,
-            "max": 100
-        },
-        "portability_range": {
-            "min": 0,
-            "max": 70
-        }
-    }
-
-    3. "Business" (Professional work, presentations, travel):
-    {
-        "specifications": {
-            "RAM (in GB)": 16,
-            "Storage": "512",
-            "Screen Size (in inch)": 14.0,
-            "processor_min": "i5"
-        },
-        "price_range": {
-            "min": 60000,
-            "max": 240000
-        },
-        "performance_range": {
-            "min": 70,
-            "max": 85
-        },
-        "portability_range": {
-            "min": 50,
-            "max": 100
-        }
-    }
-
-    4. "Content Creation" (Video editing, 3D rendering, graphic design):
-    {
-        "specifications": {
-            "RAM (in GB)": 32,
-            "Storage": "1024",
-            "Screen Size (in inch)": 15.6,
-            "dedicated_graphics": true
-        },
-        "price_range": {
-            "min": 120000,
-            "max": 301990
-        },
-        "performance_range": {
-            "min": 70,
-            "max": 100
-        },
-        "portability_range": {
-            "min": 40,
-            "max": 70
-        }
-    }
-
-    5. "Programming/Development" (Coding, compilation, virtual machines):
-    {
-        "specifications": {
-            "RAM (in GB)": 16,
-            "Storage": "512",
-            "Screen Size (in inch)": 15.6,
-            "processor_min": "i7"
-        },
-        "price_range": {
-            "min": 70000,
-            "max": 200000
-        },
-        "performance_range": {
-            "min": 65,
-            "max": 90
-        },
-        "portability_range": {
-            "min": 40,
-            "max": 100
-        }
-    }
-
-    **Performance Range Guidelines:**
-    - Basic/Student (web browsing, documents): 50-70
-    - Productivity (multiple applications, light editing): 65-80
-    - Creative Work (video editing, design): 75-90
-    - Gaming/Professional: 85-100
-
-    **Portability Range Guidelines:**
-    - Desktop Replacement (>2.5kg): 0-30
-    - All-Purpose (2-2.5kg): 30-60
-    - Ultraportable (<2kg): 60-100
-
-    **Sample Query Mappings:**
-
-    1. "I need a laptop for college programming":
-    {
-        "specifications": {
-            "RAM (in GB)": 16,
-            "Storage": "512",
-            "Screen Size (in inch)": 15.6,
-            "dedicated_graphics": false
-        },
-        "price_range": {
-            "min": 60000,
-            "max": 100000
-        },
-        "performance_range": {
-            "min": 60,
-            "max": 90
-        },
-        "portability_range": {
-            "min": 0,
-            "max": 90
-        }
-    }
-
-    2. "Looking for a gaming laptop under 1 lakh":
-    {
-        "specifications": {
-            "RAM (in GB)": 16,
-            "Storage": "512",
-            "Screen Size (in inch)": 15.6,
-            "dedicated_graphics": true
-        },
-        "price_range": {
-            "min": 60000,
-            "max": 100000
-        },
-        "performance_range": {
-            "min": 60,
-            "max": 100
-        },
-        "portability_range": {
-            "min": 0,
-            "max": 70
-        }
-    }
-
-    3. "Need a lightweight laptop for work":
-    {
-        "specifications": {
-            "RAM (in GB)": 8,
-            "Storage": "512",
-            "Screen Size (in inch)": 14.0,
-            "dedicated_graphics": false
-        },
-        "price_range": {
-            "min": 45000,
-            "max": 80000
-        },
-        "performance_range": {
-            "min": 60,
-            "max": 100
-        },
-        "portability_range": {
-            "min": 60,
-            "max": 100
-        }
-    }
-
-    These sample queries demonstrate how to convert common user requests into structured JSON format. The specifications and ranges are optimized based on the typical requirements for each use case while considering budget constraints and portability needs.
-
-    Always maintain this structure when parsing user queries, adjusting the values based on specific requirements mentioned in the query while using these samples as baseline references for similar requests.
-
-    Always provide complete JSON objects with all required fields. If specific requirements aren't mentioned, use the context to infer appropriate ranges based on the use case and budget constraints. Do not give any explanation for the JSON object. Only provide the JSON object.
-"""
-
-response_rules = """
-    1. Do not mention portability, value, performance and similarity scores.
-    2. If the recommendations is empty or contain null values suggest generally without too much details and ask user to elaborate their needs.
-    3. If the user asks for a laptop under 1 lakh, suggest a laptop under 1 lakh.
-    4. If the user asks for 5 laptops suggest 5 laptops and 10 for 10 and so on. Do not suggest more than what the user asks for.
-    5. If the user doesn't ask for a specific number of laptops, suggest 3 laptops.
-"""
-
-
-parse_prompt = ChatPromptTemplate.from_messages(
-    [
-        MessagesPlaceholder(variable_name='history'),
-        ('human', "Given this knowledge base:\n{knowledge_base}\nResponde to this:\n{question}")
-    ]
-)
-
-response_prompt = ChatPromptTemplate.from_messages(
-    [
-        MessagesPlaceholder(variable_name='history'),
-        ('human', "Using recommendations: {recommendations}, answer the user's query: {question}. Considering these {response_rules}")
-    ]
-)
-
-output_parser = StrOutputParser()
-
-# Session memory management
-context = {}
-
-def get_by_session_id(session_id: str) -> BaseChatMessageHistory:
-    if session_id not in context:
-        context[session_id] = InMemoryChatMessageHistory()
-    return context[session_id]
-
-# Creating chains
-parse_chain_with_history = RunnableWithMessageHistory(
-    parse_prompt | model | output_parser,
-    get_by_session_id,
-    input_messages_key='question',
-    history_messages_key='history',
-)
-
-response_chain_with_history = RunnableWithMessageHistory(
-    response_prompt | model | output_parser,
-    get_by_session_id,
-    input_messages_key='question',
-    history_messages_key='history',
-)
-
-
-def find_recommendations(parsed_input):
-    try:
-        recommendations = filter_laptops(parsed_input)
-        if "error" in recommendations:
-            raise ValueError(recommendations["error"])
-        return recommendations
-        
-    except Exception as e:
-        return {"error": f"Recommendation error: {str(e)}"}
-
-session_state = {}
-
-def generate_response(user_message, session_id='default'):
-    try:
-        if session_id not in session_state:
-            session_state[session_id] = {
-                "parsed_data": None,
-                "recommendations": None,
-            }
-
-        session = session_state[session_id]
-
-        if session["parsed_data"] is None:
-            parsed_input = parse_chain_with_history.invoke(
-                {'question': user_message, 'knowledge_base': knowledge_base},
-                config={'configurable': {'session_id': session_id}}
-            )
-            parsed_input = strip_backticks(parsed_input)
-            print("DEBUG: PARSED INPUT: ", parsed_input)
-            
-            try:
-                session["parsed_data"] = json.loads(parsed_input)
-                filtered_results = filter_laptops(session["parsed_data"])
-                
-                if filtered_results["status"] == "success" and filtered_results["filtered_laptops"]:
-                    # Format recommendations for the chatbot
-                    formatted_recommendations = {
-                        "best_match": filtered_results["filtered_laptops"][0],
-                        "similar_recommendations": filtered_results["filtered_laptops"][1:],
-                        "total_matches": filtered_results["total_matches"]
-                    }
-                    session["recommendations"] = formatted_recommendations
-                else:
-                    return "I couldn't find any laptops matching your requirements. Could you please adjust your criteria?"
-                
-            except json.JSONDecodeError:
-                return "Could you provide more specific details about your requirements?"
-        else:
-            # Handle follow-up questions using existing recommendations
-            formatted_recommendations = session["recommendations"]
-
-        response = response_chain_with_history.invoke(
-            {
-                'question': user_message,
-                'recommendations': formatted_recommendations,
-                'response_rules': response_rules
-            },
-            config={'configurable': {'session_id': session_id}}
-        )
-        print("DEBUG: RESPONSE: ", response)
-        return response.strip()
-
-    except Exception as e:
-        print("Error in generating response:", e)
-        return "An error occurred while processing your request. Please try again with different requirements."
\ No newline at end of file
+import os
+import json
+import time
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from recommendation import DEFAULT_SIMILAR_K, catalogues, filter_laptops, find_similar, refine_laptops
+from parse_cache import ParseCache
+from intent_parser import parse_locally, parse_refinement, parse_similarity_request
+from session_store import SessionStore
+from prompting import HistoryPolicy, count_message_tokens, count_tokens, format_recommendations, summarize_turns
+from metrics import llm_coalesced, llm_tokens, parse_source, registry, stage_seconds, startup_seconds
+from single_flight import SingleFlight
+
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+# Model: OpenAI by default; LLM_BACKEND=replay answers from recorded outputs without network access.
+# The LangChain model stack takes seconds to import, so it is only loaded when the chains are built
+def build_model():
+    from model_backend import RecordingChatModel, ReplayChatModel
+
+    backend = os.getenv("LLM_BACKEND", "openai").lower()
+    if backend == "replay":
+        return ReplayChatModel(
+            recordings_path=os.getenv("LLM_REPLAY_PATH"),
+            latency=float(os.getenv("LLM_REPLAY_LATENCY", "0")),
+            chunk_delay=float(os.getenv("LLM_REPLAY_CHUNK_DELAY", "0")),
+        )
+    if backend != "openai":
+        raise ValueError(f"Unknown LLM_BACKEND {backend!r}: use 'openai' or 'replay'")
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise Exception("OpenAI API key not set")
+    from langchain_openai import ChatOpenAI
+    from pydantic import SecretStr
+
+    openai_model = ChatOpenAI(
+        model="gpt-4o-mini",
+        temperature=0.4,
+        api_key=SecretStr(api_key),
+    )
+    # Record every output so the same conversations can be replayed offline
+    record_path = os.getenv("LLM_RECORD_PATH")
+    return RecordingChatModel(model=openai_model, path=record_path) if record_path else openai_model
+
+# Parsed preferences cache, shared by all sessions
+parse_cache = ParseCache(
+    max_entries=int(os.getenv("PARSE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("PARSE_CACHE_TTL", str(24 * 3600))),
+    path=os.getenv("PARSE_CACHE_PATH"),
+)
+
+registry.gauge('laptopgpt_parse_cache_hit_ratio', 'Share of parse cache lookups that were hits.',
+               lambda: parse_cache.stats()['hit_rate'])
+registry.gauge('laptopgpt_parse_cache_entries', 'Parsed messages held in the in-memory parse cache.',
+               lambda: parse_cache.stats()['entries'])
+
+# Messages the rule-based parser understands at least this well skip the LLM parse
+FAST_PARSE_THRESHOLD = float(os.getenv("FAST_PARSE_THRESHOLD", "0.7"))
+
+def strip_backticks(code):
+    if code.startswith("```") and code.endswith("```"):
+        code = code[3:]
+        first_newline_index = code.find("\n")
+        if first_newline_index != -1:
+            code = code[first_newline_index + 1:]
+        code = code.rstrip("`")
+    return code
+
+knowledge_base = """
+    You are an advanced laptop recommendation expert with deep knowledge of computer hardware and user requirements. Your task is to analyze user queries and convert them into a structured JSON format that captures both explicit requirements and implicit needs based on use cases.
+
+    **Core Responsibilities:**
+    1. Convert user requirements into specific technical specifications
+    2. Infer appropriate performance and portability ranges based on use cases
+    3. Set reasonable price ranges based on requirements
+    4. Handle both technical and non-technical user queries
+    5. We have Max RAM size of 32 in dataset, Storage of 1024.
+    6. Screen Size we have are 13.3, 14.0, 15.6, 16.1, 17.3
+    7. For Desktop replacement strictly keep portability upper range till 50
+    8. The price in the dataset ranges from 15990 to 301990, if lower limit is provided set upper limit the highest and vice versa.
+
+    **Use Case Mappings:**
+
+    1. "Student/Basic Use" (Web browsing, documents, basic multitasking):
+    {
+        "specifications": {
+            "RAM (in GB)": 8,
+            "Storage": "256",
+            "Screen Size (in inch)": 14.0,
+            "dedicated_graphics": false
+        },
+        "price_range": {
+            "min": 30000,
+            "max": 60000
+        },
+        "performance_range": {
+            "min": 30,
+            "max": 75
+        },
+        "portability_range": {
+            "min": 60,
+            "max": 100
+        }
+    }
+
+    2. "Gaming" (High-performance gaming, streaming):
+    {
+        "specifications": {
+            "RAM (in GB)": 16,
+            "Storage": "512",
+            "Screen Size (in inch)": 15.6,
+            "processor_min": "i5",
+            "dedicated_graphics": true
+        },
+        "price_range": {
+            "min": 80000,
+            "max": 301990
+        },
+        "performance_range": {
+            "min": 80,
+            "max": 100
+        },
+        "portability_range": {
+            "min": 0,
+            "max": 70
+        }
+    }
+
+    3. "Business" (Professional work, presentations, travel):
+    {
+        "specifications": {
+            "RAM (in GB)": 16,
+            "Storage": "512",
+            "Screen Size (in inch)": 14.0,
+            "processor_min": "i5"
+        },
+        "price_range": {
+            "min": 60000,
+            "max": 240000
+        },
+        "performance_range": {
+            "min": 70,
+            "max": 85
+        },
+        "portability_range": {
+            "min": 50,
+            "max": 100
+        }
+    }
+
+    4. "Content Creation" (Video editing, 3D rendering, graphic design):
+    {
+        "specifications": {
+            "RAM (in GB)": 32,
+            "Storage": "1024",
+            "Screen Size (in inch)": 15.6,
+            "dedicated_graphics": true
+        },
+        "price_range": {
+            "min": 120000,
+            "max": 301990
+        },
+        "performance_range": {
+            "min": 70,
+            "max": 100
+        },
+        "portability_range": {
+            "min": 40,
+            "max": 70
+        }
+    }
+
+    5. "Programming/Development" (Coding, compilation, virtual machines):
+    {
+        "specifications": {
+            "RAM (in GB)": 16,
+            "Storage": "512",
+            "Screen Size (in inch)": 15.6,
+            "processor_min": "i7"
+        },
+        "price_range": {
+            "min": 70000,
+            "max": 200000
+        },
+        "performance_range": {
+            "min": 65,
+            "max": 90
+        },
+        "portability_range": {
+            "min": 40,
+            "max": 100
+        }
+    }
+
+    **Performance Range Guidelines:**
+    - Basic/Student (web browsing, documents): 50-70
+    - Productivity (multiple applications, light editing): 65-80
+    - Creative Work (video editing, design): 75-90
+    - Gaming/Professional: 85-100
+
+    **Portability Range Guidelines:**
+    - Desktop Replacement (>2.5kg): 0-30
+    - All-Purpose (2-2.5kg): 30-60
+    - Ultraportable (<2kg): 60-100
+
+    **Sample Query Mappings:**
+
+    1. "I need a laptop for college programming":
+    {
+        "specifications": {
+            "RAM (in GB)": 16,
+            "Storage": "512",
+            "Screen Size (in inch)": 15.6,
+            "dedicated_graphics": false
+        },
+        "price_range": {
+            "min": 60000,
+            "max": 100000
+        },
+        "performance_range": {
+            "min": 60,
+            "max": 90
+        },
+        "portability_range": {
+            "min": 0,
+            "max": 90
+        }
+    }
+
+    2. "Looking for a gaming laptop under 1 lakh":
+    {
+        "specifications": {
+            "RAM (in GB)": 16,
+            "Storage": "512",
+            "Screen Size (in inch)": 15.6,
+            "dedicated_graphics": true
+        },
+        "price_range": {
+            "min": 60000,
+            "max": 100000
+        },
+        "performance_range": {
+            "min": 60,
+            "max": 100
+        },
+        "portability_range": {
+            "min": 0,
+            "max": 70
+        }
+    }
+
+    3. "Need a lightweight laptop for work":
+    {
+        "specifications": {
+            "RAM (in GB)": 8,
+            "Storage": "512",
+            "Screen Size (in inch)": 14.0,
+            "dedicated_graphics": false
+        },
+        "price_range": {
+            "min": 45000,
+            "max": 80000
+        },
+        "performance_range": {
+            "min": 60,
+            "max": 100
+        },
+        "portability_range": {
+            "min": 60,
+            "max": 100
+        }
+    }
+
+    These sample queries demonstrate how to convert common user requests into structured JSON format. The specifications and ranges are optimized based on the typical requirements for each use case while considering budget constraints and portability needs.
+
+    Always maintain this structure when parsing user queries, adjusting the values based on specific requirements mentioned in the query while using these samples as baseline references for similar requests.
+
+    Always provide complete JSON objects with all required fields. If specific requirements aren't mentioned, use the context to infer appropriate ranges based on the use case and budget constraints. Do not give any explanation for the JSON object. Only provide the JSON object.
+"""
+
+response_rules = """
+    1. Do not mention portability, value, performance and similarity scores.
+    2. If the recommendations is empty or contain null values suggest generally without too much details and ask user to elaborate their needs.
+    3. If the user asks for a laptop under 1 lakh, suggest a laptop under 1 lakh.
+    4. If the user asks for 5 laptops suggest 5 laptops and 10 for 10 and so on. Do not suggest more than what the user asks for.
+    5. If the user doesn't ask for a specific number of laptops, suggest 3 laptops.
+"""
+
+
+# Session memory management
+session_store = SessionStore(
+    max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+    idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "3600")),
+    max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024))),
+    max_messages=int(os.getenv("SESSION_MAX_MESSAGES", "50")),
+    path=os.getenv("SESSION_DB_PATH"),
+)
+
+registry.gauge('laptopgpt_sessions', 'Sessions held in memory.', lambda: session_store.stats()['sessions'])
+registry.gauge('laptopgpt_session_bytes', 'Approximate memory used by the sessions.', lambda: session_store.stats()['bytes'])
+
+def get_by_session_id(session_id: str):
+    return session_store.history(session_id)
+
+# Prompt size management: only a token-budgeted window of the history is sent
+history_policy = HistoryPolicy(
+    max_turns=int(os.getenv("HISTORY_MAX_TURNS", "6")),
+    max_tokens=int(os.getenv("HISTORY_MAX_TOKENS", "2000")),
+    summarizer=summarize_turns if os.getenv("HISTORY_SUMMARIZE", "").lower() in ("1", "true", "yes") else None,
+)
+
+def window_history(inputs):
+    return history_policy.apply(inputs['history'])
+
+def report_prompt_tokens(chain_name):
+    def report(prompt_value):
+        tokens = count_message_tokens(prompt_value.to_messages())
+        llm_tokens.inc(tokens, chain=chain_name, kind='prompt')
+        logger.debug("%s prompt tokens: %d", chain_name, tokens)
+        return prompt_value
+    return report
+
+# The model and chains, built by llm_chains() on first use or ahead of it by warm_up()
+model = None
+chains = None
+chains_lock = threading.Lock()
+
+def llm_chains():
+    """The "parse" and "response" chains, built on the first call."""
+    global model, chains
+    if chains is not None:
+        return chains
+    with chains_lock:
+        if chains is None:
+            with startup_seconds.time(step='chains'):
+                from langchain_core.output_parsers import StrOutputParser
+                from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+                from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+                from langchain_core.runnables.history import RunnableWithMessageHistory
+
+                prompts = {
+                    "parse": ChatPromptTemplate.from_messages([
+                        MessagesPlaceholder(variable_name='history'),
+                        ('human', "Given this knowledge base:\n{knowledge_base}\nResponde to this:\n{question}")
+                    ]),
+                    "response": ChatPromptTemplate.from_messages([
+                        MessagesPlaceholder(variable_name='history'),
+                        ('human', "Using recommendations: {recommendations}, answer the user's query: {question}. Considering these {response_rules}")
+                    ]),
+                }
+                model = build_model()
+                chains = {
+                    name: RunnableWithMessageHistory(
+                        RunnablePassthrough.assign(history=window_history) | prompt
+                        | RunnableLambda(report_prompt_tokens(name)) | model | StrOutputParser(),
+                        get_by_session_id,
+                        input_messages_key='question',
+                        history_messages_key='history',
+                    )
+                    for name, prompt in prompts.items()
+                }
+    return chains
+
+# Set once warm_up() has run: None when it succeeded, otherwise why it failed
+warm_up_error = None
+warmed_up = threading.Event()
+warm_up_thread = None
+
+def warm_up():
+    """Load what the first chat would otherwise wait for: the catalogue with its indexes, the model and the chains.
+
+    Run by the servers in the background at startup; readiness() reports when it has finished.
+    """
+    global warm_up_error
+    try:
+        with startup_seconds.time(step='catalogue'):
+            catalogues.load()
+        llm_chains()
+    except Exception as e:
+        logger.exception("Warm-up failed: %s", e)
+        warm_up_error = str(e)
+    finally:
+        warmed_up.set()
+
+def start_warm_up():
+    """Run warm_up() on a background thread, once per process."""
+    global warm_up_thread
+    if warm_up_thread is None:
+        warm_up_thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+        warm_up_thread.start()
+
+def readiness():
+    """(ready, details) for the readiness endpoint: ready once warm_up() has succeeded.
+
+    Without a warm-up everything loads on first use, so the process is always ready.
+    """
+    if warm_up_thread is None:
+        return True, {"status": "ready", "warm_up": False}
+    if not warmed_up.is_set():
+        return False, {"status": "starting"}
+    if warm_up_error is not None:
+        return False, {"status": "failed", "error": warm_up_error}
+    return True, {"status": "ready", "catalogue_version": catalogues.current().version}
+
+registry.gauge('laptopgpt_ready', 'Whether warm-up has finished successfully (1) or not (0).',
+               lambda: float(readiness()[0]))
+
+# Identical model calls made at the same time share one upstream call
+llm_flights = SingleFlight()
+
+def flight_key(chain_name, session_id, *inputs):
+    """Key under which a model call is shared: calls with the same inputs and session history send the same prompt.
+
+    In practice these are first turns, whose only history is the identical parse turn.
+    """
+    history = tuple((message.type, message.content) for message in session_store.messages(session_id))
+    return (chain_name, history) + inputs
+
+def share_turn(chain_name, session_id, user_message, output):
+    """Store a shared call's turn in the session, as the chain did for the caller that made it."""
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    llm_coalesced.inc(chain=chain_name)
+    session_store.add_messages(session_id, [HumanMessage(content=user_message), AIMessage(content=output)])
+
+def invoke_chain(chain_name, chain, inputs, session_id, *key_inputs):
+    """Invoke a chain with history, sharing the call with identical ones in flight; returns (output, shared)."""
+    config = {'configurable': {'session_id': session_id}}
+    output, shared = llm_flights.do(flight_key(chain_name, session_id, *key_inputs), lambda: chain.invoke(inputs, config=config))
+    if shared:
+        share_turn(chain_name, session_id, inputs['question'], output)
+    return output, shared
+
+async def ainvoke_chain(chain_name, chain, inputs, session_id, *key_inputs):
+    """Async counterpart of invoke_chain."""
+    config = {'configurable': {'session_id': session_id}}
+    output, shared = await llm_flights.ado(flight_key(chain_name, session_id, *key_inputs), lambda: chain.ainvoke(inputs, config=config))
+    if shared:
+        share_turn(chain_name, session_id, inputs['question'], output)
+    return output, shared
+
+def stream_chain(chain_name, chain, inputs, session_id, *key_inputs):
+    """Stream a chain with history, sharing the stream with identical ones in flight; returns (chunks, shared)."""
+    config = {'configurable': {'session_id': session_id}}
+    chunks, shared = llm_flights.stream(flight_key(chain_name, session_id, *key_inputs), lambda: chain.stream(inputs, config=config))
+    if shared:
+        chunks = follow_stream(chain_name, session_id, inputs['question'], chunks)
+    return chunks, shared
+
+def follow_stream(chain_name, session_id, user_message, chunks):
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    share_turn(chain_name, session_id, user_message, "".join(parts))
+
+def astream_chain(chain_name, chain, inputs, session_id, *key_inputs):
+    """Async counterpart of stream_chain."""
+    config = {'configurable': {'session_id': session_id}}
+    chunks, shared = llm_flights.astream(flight_key(chain_name, session_id, *key_inputs), lambda: chain.astream(inputs, config=config))
+    if shared:
+        chunks = afollow_stream(chain_name, session_id, inputs['question'], chunks)
+    return chunks, shared
+
+async def afollow_stream(chain_name, session_id, user_message, chunks):
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    share_turn(chain_name, session_id, user_message, "".join(parts))
+
+
+def find_recommendations(parsed_input):
+    try:
+        recommendations = filter_laptops(parsed_input)
+        if "error" in recommendations:
+            raise ValueError(recommendations["error"])
+        return recommendations
+        
+    except Exception as e:
+        return {"error": f"Recommendation error: {str(e)}"}
+
+def record_completion(chain_name, text):
+    llm_tokens.inc(count_tokens(text), chain=chain_name, kind='completion')
+
+def decode_parsed_input(parsed_input):
+    with stage_seconds.time(stage='parse_decode'):
+        parsed_input = strip_backticks(parsed_input)
+        logger.debug("Parsed input: %s", parsed_input)
+        return json.loads(parsed_input)
+
+def parse_fast(user_message):
+    with stage_seconds.time(stage='parse_fast'):
+        parsed_data, confidence = parse_locally(user_message)
+    if confidence < FAST_PARSE_THRESHOLD:
+        return None
+    logger.debug("Fast parse (confidence %.2f): %s", confidence, parsed_data)
+    return parsed_data
+
+def parse_without_llm(user_message):
+    """Preferences from the parse cache or the rule-based parser, or None when the LLM is needed."""
+    with stage_seconds.time(stage='parse_cache'):
+        cached = parse_cache.get(user_message)
+    if cached is not None:
+        parse_source.inc(source='cache')
+        logger.debug("Parse cache hit: %s", cached)
+        return cached
+
+    parsed_data = parse_fast(user_message)
+    if parsed_data is not None:
+        parse_source.inc(source='fast')
+    return parsed_data
+
+def parse_preferences(user_message, session_id):
+    parsed_data = parse_without_llm(user_message)
+    if parsed_data is not None:
+        return parsed_data
+
+    parse_source.inc(source='llm')
+    with stage_seconds.time(stage='parse_llm'):
+        parsed_output, shared = invoke_chain(
+            "parse", llm_chains()["parse"], {'question': user_message, 'knowledge_base': knowledge_base},
+            session_id, user_message
+        )
+    if not shared:
+        record_completion("parse", parsed_output)
+    parsed_data = decode_parsed_input(parsed_output)
+    parse_cache.put(user_message, parsed_data)
+    return parsed_data
+
+async def aparse_preferences(user_message, session_id):
+    parsed_data = parse_without_llm(user_message)
+    if parsed_data is not None:
+        return parsed_data
+
+    parse_source.inc(source='llm')
+    with stage_seconds.time(stage='parse_llm'):
+        parsed_output, shared = await ainvoke_chain(
+            "parse", llm_chains()["parse"], {'question': user_message, 'knowledge_base': knowledge_base},
+            session_id, user_message
+        )
+    if not shared:
+        record_completion("parse", parsed_output)
+    parsed_data = decode_parsed_input(parsed_output)
+    parse_cache.put(user_message, parsed_data)
+    return parsed_data
+
+NO_MATCHES_MESSAGE = "I couldn't find any laptops matching your requirements. Could you please adjust your criteria?"
+UNPARSEABLE_MESSAGE = "Could you provide more specific details about your requirements?"
+NO_SIMILAR_MESSAGE = "I couldn't find a laptop like that one with those changes. Could you relax one of them?"
+ERROR_MESSAGE = "An error occurred while processing your request. Please try again with different requirements."
+
+# Runs the CPU-bound filtering for the async pipeline off the event loop
+filter_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FILTER_WORKERS", "4")),
+    thread_name_prefix="filter",
+)
+
+def summarize_results(filtered_results):
+    """Shape filter_laptops output for the response prompt, or None when nothing matched."""
+    if filtered_results["status"] == "success" and filtered_results["filtered_laptops"]:
+        return {
+            "best_match": filtered_results["filtered_laptops"][0],
+            "similar_recommendations": filtered_results["filtered_laptops"][1:],
+            "total_matches": filtered_results["total_matches"],
+            "catalogue_version": filtered_results.get("catalogue_version")
+        }
+    return None
+
+def find_similar_followup(user_message, recommendations, top_k=None):
+    """Answer follow-ups like "the second one but cheaper" from the similarity index.
+
+    Returns find_similar results, or None when the message is not such a
+    follow-up, so it goes through the normal parse instead.
+    """
+    request = parse_similarity_request(user_message)
+    if request is None or not recommendations:
+        return None
+    position, modifiers = request
+    laptops = [recommendations["best_match"]] + recommendations["similar_recommendations"]
+    if not -len(laptops) <= position < len(laptops) or "id" not in laptops[position]:
+        return None
+    logger.debug("Similar to laptop %s: %s", laptops[position]["id"], modifiers)
+    with stage_seconds.time(stage='similar'):
+        return find_similar(laptops[position]["id"], top_k or DEFAULT_SIMILAR_K, modifiers)
+
+def catalogue_version(session_id):
+    """Catalogue version behind the session's recommendations, or the one currently served."""
+    recommendations = session_store.load(session_id)["recommendations"] or {}
+    return recommendations.get("catalogue_version") or catalogues.current().version
+
+def use_similar(session_id, session, similar):
+    """Make similar laptops the session's recommendations, so later follow-ups refer to them."""
+    recommendations = summarize_results(similar)
+    if recommendations is None:
+        return None, NO_SIMILAR_MESSAGE
+    session["recommendations"] = recommendations
+    session_store.save(session_id, session)
+    return recommendations, None
+
+def use_refined(session_id, session, refined):
+    """Make a refined search the session's preferences and recommendations, so later follow-ups refine it further."""
+    recommendations = summarize_results(refined)
+    if recommendations is None:
+        return None, NO_MATCHES_MESSAGE
+    logger.debug("Refined search (%s): %d matches", refined["refinement"], refined["total_matches"])
+    session["parsed_data"] = refined["preferences"]
+    session["candidates"] = refined["candidates"]
+    session["recommendations"] = recommendations
+    session_store.save(session_id, session)
+    return recommendations, None
+
+def get_recommendations(user_message, session_id, top_k=None):
+    """Return (recommendations, None), or (None, reply) when the query cannot be answered from the catalogue.
+
+    A new search ranks the ``top_k`` best laptops. Follow-ups such as "like the
+    second one but cheaper" are answered from the similarity index, and ones
+    that change the preferences ("cheaper", "with 32GB RAM") refine the last
+    search; other follow-ups reuse the session's recommendations.
+    """
+    session = session_store.load(session_id)
+
+    similar = find_similar_followup(user_message, session["recommendations"], top_k)
+    if similar is not None:
+        return use_similar(session_id, session, similar)
+
+    if session["parsed_data"] is None:
+        try:
+            session["parsed_data"] = parse_preferences(user_message, session_id)
+        except json.JSONDecodeError:
+            return None, UNPARSEABLE_MESSAGE
+
+        filtered_results = filter_laptops(session["parsed_data"], top_k=top_k, keep_candidates=True)
+        session["candidates"] = filtered_results.get("candidates")
+        session["recommendations"] = summarize_results(filtered_results)
+        session_store.save(session_id, session)
+        if session["recommendations"] is None:
+            return None, NO_MATCHES_MESSAGE
+        return session["recommendations"], None
+
+    delta = parse_refinement(user_message, session["parsed_data"])
+    if delta is not None:
+        return use_refined(session_id, session, refine_laptops(
+            session["parsed_data"], delta, session.get("candidates"), top_k=top_k
+        ))
+
+    # Follow-up questions reuse the existing recommendations
+    return session["recommendations"], None
+
+async def aget_recommendations(user_message, session_id, top_k=None):
+    """Async counterpart of get_recommendations."""
+    session = session_store.load(session_id)
+    loop = asyncio.get_running_loop()
+
+    if session["recommendations"]:
+        similar = await loop.run_in_executor(
+            filter_executor, find_similar_followup, user_message, session["recommendations"], top_k
+        )
+        if similar is not None:
+            return use_similar(session_id, session, similar)
+
+    if session["parsed_data"] is None:
+        try:
+            session["parsed_data"] = await aparse_preferences(user_message, session_id)
+        except json.JSONDecodeError:
+            return None, UNPARSEABLE_MESSAGE
+
+        filtered_results = await loop.run_in_executor(
+            filter_executor,
+            functools.partial(filter_laptops, session["parsed_data"], top_k=top_k, keep_candidates=True)
+        )
+        session["candidates"] = filtered_results.get("candidates")
+        session["recommendations"] = summarize_results(filtered_results)
+        session_store.save(session_id, session)
+        if session["recommendations"] is None:
+            return None, NO_MATCHES_MESSAGE
+        return session["recommendations"], None
+
+    delta = parse_refinement(user_message, session["parsed_data"])
+    if delta is not None:
+        refined = await loop.run_in_executor(
+            filter_executor,
+            functools.partial(refine_laptops, session["parsed_data"], delta, session.get("candidates"), top_k=top_k)
+        )
+        return use_refined(session_id, session, refined)
+
+    return session["recommendations"], None
+
+def response_inputs(user_message, recommendations):
+    return {
+        'question': user_message,
+        'recommendations': format_recommendations(recommendations),
+        'response_rules': response_rules
+    }
+
+def generate_response(user_message, session_id='default', top_k=None):
+    try:
+        formatted_recommendations, reply = get_recommendations(user_message, session_id, top_k)
+        if reply:
+            return reply
+
+        inputs = response_inputs(user_message, formatted_recommendations)
+        with stage_seconds.time(stage='response_llm'):
+            response, shared = invoke_chain(
+                "response", llm_chains()["response"], inputs, session_id,
+                user_message, inputs['recommendations']
+            )
+        if not shared:
+            record_completion("response", response)
+        logger.debug("Response: %s", response)
+        return response.strip()
+
+    except Exception as e:
+        logger.exception("Error in generating response: %s", e)
+        return ERROR_MESSAGE
+
+def stream_response(user_message, session_id='default', top_k=None):
+    """Yield (event, data) pairs for a streamed reply.
+
+    A "recommendations" event with the matched laptops is sent as soon as
+    filtering finishes, followed by a "token" event per response chunk and a
+    final "done" event carrying the complete reply.
+    """
+    try:
+        formatted_recommendations, reply = get_recommendations(user_message, session_id, top_k)
+        if reply:
+            yield "done", reply
+            return
+
+        if formatted_recommendations:
+            yield "recommendations", {
+                "filtered_laptops": [formatted_recommendations["best_match"]] + formatted_recommendations["similar_recommendations"],
+                "total_matches": formatted_recommendations["total_matches"],
+                "catalogue_version": formatted_recommendations.get("catalogue_version")
+            }
+
+        inputs = response_inputs(user_message, formatted_recommendations)
+        chunks = []
+        started = time.perf_counter()
+        stream, shared = stream_chain(
+            "response", llm_chains()["response"], inputs, session_id,
+            user_message, inputs['recommendations']
+        )
+        for chunk in stream:
+            if not chunks:
+                stage_seconds.observe(time.perf_counter() - started, stage='response_first_token')
+            chunks.append(chunk)
+            yield "token", chunk
+        stage_seconds.observe(time.perf_counter() - started, stage='response_llm')
+
+        response = "".join(chunks)
+        if not shared:
+            record_completion("response", response)
+        logger.debug("Response: %s", response)
+        yield "done", response.strip()
+
+    except Exception as e:
+        logger.exception("Error in generating response: %s", e)
+        yield "done", ERROR_MESSAGE
+
+async def agenerate_response(user_message, session_id='default', top_k=None):
+    """Async counterpart of generate_response for the ASGI app."""
+    try:
+        formatted_recommendations, reply = await aget_recommendations(user_message, session_id, top_k)
+        if reply:
+            return reply
+
+        inputs = response_inputs(user_message, formatted_recommendations)
+        with stage_seconds.time(stage='response_llm'):
+            response, shared = await ainvoke_chain(
+                "response", llm_chains()["response"], inputs, session_id,
+                user_message, inputs['recommendations']
+            )
+        if not shared:
+            record_completion("response", response)
+        logger.debug("Response: %s", response)
+        return response.strip()
+
+    except Exception as e:
+        logger.exception("Error in generating response: %s", e)
+        return ERROR_MESSAGE
+
+async def astream_response(user_message, session_id='default', top_k=None):
+    """Async counterpart of stream_response for the ASGI app."""
+    try:
+        formatted_recommendations, reply = await aget_recommendations(user_message, session_id, top_k)
+        if reply:
+            yield "done", reply
+            return
+
+        if formatted_recommendations:
+            yield "recommendations", {
+                "filtered_laptops": [formatted_recommendations["best_match"]] + formatted_recommendations["similar_recommendations"],
+                "total_matches": formatted_recommendations["total_matches"],
+                "catalogue_version": formatted_recommendations.get("catalogue_version")
+            }
+
+        inputs = response_inputs(user_message, formatted_recommendations)
+        chunks = []
+        started = time.perf_counter()
+        stream, shared = astream_chain(
+            "response", llm_chains()["response"], inputs, session_id,
+            user_message, inputs['recommendations']
+        )
+        async for chunk in stream:
+            if not chunks:
+                stage_seconds.observe(time.perf_counter() - started, stage='response_first_token')
+            chunks.append(chunk)
+            yield "token", chunk
+        stage_seconds.observe(time.perf_counter() - started, stage='response_llm')
+
+        response = "".join(chunks)
+        if not shared:
+            record_completion("response", response)
+        logger.debug("Response: %s", response)
+        yield "done", response.strip()
+
+    except Exception as e:
+        logger.exception("Error in generating response: %s", e)
+        yield "done", ERROR_MESSAGE
\ No newline at end of file
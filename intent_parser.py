@@ -0,0 +1,404 @@
+import copy
+import re
+from typing import Dict, List, Optional, Tuple
+
+from parse_cache import normalize_message
+
+MIN_PRICE = 15990
+MAX_PRICE = 301990
+MAX_RAM = 32
+MAX_STORAGE = 1024
+
+# Use case templates, mirroring the mappings in chatbot.knowledge_base
+USE_CASES = {
+    "student": {
+        "specifications": {"RAM (in GB)": 8, "Storage": "256", "Screen Size (in inch)": 14.0, "dedicated_graphics": False},
+        "price_range": {"min": 30000, "max": 60000},
+        "performance_range": {"min": 30, "max": 75},
+        "portability_range": {"min": 60, "max": 100},
+    },
+    "gaming": {
+        "specifications": {"RAM (in GB)": 16, "Storage": "512", "Screen Size (in inch)": 15.6, "processor_min": "i5",
+                           "dedicated_graphics": True},
+        "price_range": {"min": 80000, "max": 301990},
+        "performance_range": {"min": 80, "max": 100},
+        "portability_range": {"min": 0, "max": 70},
+    },
+    "business": {
+        "specifications": {"RAM (in GB)": 16, "Storage": "512", "Screen Size (in inch)": 14.0, "processor_min": "i5"},
+        "price_range": {"min": 60000, "max": 240000},
+        "performance_range": {"min": 70, "max": 85},
+        "portability_range": {"min": 50, "max": 100},
+    },
+    "content_creation": {
+        "specifications": {"RAM (in GB)": 32, "Storage": "1024", "Screen Size (in inch)": 15.6, "dedicated_graphics": True},
+        "price_range": {"min": 120000, "max": 301990},
+        "performance_range": {"min": 70, "max": 100},
+        "portability_range": {"min": 40, "max": 70},
+    },
+    "programming": {
+        "specifications": {"RAM (in GB)": 16, "Storage": "512", "Screen Size (in inch)": 15.6, "processor_min": "i7"},
+        "price_range": {"min": 70000, "max": 200000},
+        "performance_range": {"min": 65, "max": 90},
+        "portability_range": {"min": 40, "max": 100},
+    },
+}
+
+# Most demanding use case first; it wins when a query mentions several
+USE_CASE_KEYWORDS = [
+    ("content_creation", r"video edit\w*|editing|render\w*|3d|graphic design\w*|designer|content creat\w*|creator"
+                         r"|photoshop|premiere|after effects|animation|blender"),
+    ("gaming", r"gam(?:e|es|ing|er|ers)|esports|valorant|fortnite|gta"),
+    ("programming", r"programm\w*|coding|coder|developer|development|software|code|compil\w*|machine learning"
+                    r"|data science|virtual machines?|vms?"),
+    ("business", r"business|office|professional|presentations?|corporate|work"),
+    ("student", r"students?|college|school|study|studies|basic|browsing|documents?|everyday|netflix|online classes"),
+]
+
+# The knowledge base's sample queries, answered exactly as it documents them
+SAMPLE_QUERIES = {
+    normalize_message("I need a laptop for college programming"): {
+        "specifications": {"RAM (in GB)": 16, "Storage": "512", "Screen Size (in inch)": 15.6, "dedicated_graphics": False},
+        "price_range": {"min": 60000, "max": 100000},
+        "performance_range": {"min": 60, "max": 90},
+        "portability_range": {"min": 0, "max": 90},
+    },
+    normalize_message("Looking for a gaming laptop under 1 lakh"): {
+        "specifications": {"RAM (in GB)": 16, "Storage": "512", "Screen Size (in inch)": 15.6, "dedicated_graphics": True},
+        "price_range": {"min": 60000, "max": 100000},
+        "performance_range": {"min": 60, "max": 100},
+        "portability_range": {"min": 0, "max": 70},
+    },
+    normalize_message("Need a lightweight laptop for work"): {
+        "specifications": {"RAM (in GB)": 8, "Storage": "512", "Screen Size (in inch)": 14.0, "dedicated_graphics": False},
+        "price_range": {"min": 45000, "max": 80000},
+        "performance_range": {"min": 60, "max": 100},
+        "portability_range": {"min": 60, "max": 100},
+    },
+}
+
+AMOUNT = r"(?:₹|rs\.?|inr)?\s*(\d+(?:\.\d+)?)\s*(lakhs?|lacs?|l|k|thousand)?\b"
+MAX_PRICE_PATTERN = re.compile(r"(?:under|below|less than|within|upto|up to|max(?:imum)?|not more than|budget(?: is| of)?)\s*" + AMOUNT)
+MIN_PRICE_PATTERN = re.compile(r"(?:above|over|more than|at least|minimum|starting(?: from| at)?)\s*" + AMOUNT)
+BETWEEN_PATTERN = re.compile(r"(?:between\s*)?" + AMOUNT + r"\s*(?:and|to|-)\s*" + AMOUNT)
+AROUND_PATTERN = re.compile(r"(?:around|about|approx(?:imately)?|roughly|near)\s*" + AMOUNT)
+
+RAM_PATTERN = re.compile(r"(\d+)\s*gb\s*(?:of\s*)?(?:ram|memory|ddr\d?)|(?:ram|memory)\s*(?:of\s*)?(\d+)\s*gb")
+STORAGE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(gb|tb)\s*(?:of\s*)?(?:ssd|hdd|storage|nvme|drive)?")
+SCREEN_PATTERN = re.compile(r"\b(1[0-8](?:\.\d+)?)\s*(?:\"|”|-?inch(?:es)?\b|in\b)")
+PROCESSOR_PATTERN = re.compile(r"\b(i[3579])\b|\b(ryzen\s*[3579])\b|\b(m[1-3](?:\s*(?:pro|max))?)\b")
+DEDICATED_GPU_PATTERN = re.compile(r"dedicated (?:graphics|gpu)|graphics card|\brtx\b|\bgtx\b|nvidia|\bgpu\b")
+INTEGRATED_GPU_PATTERN = re.compile(r"integrated graphics|no (?:dedicated )?(?:gpu|graphics)")
+LIGHTWEIGHT_PATTERN = re.compile(r"light\s*weight|lightest|thin and light|ultra\s*portable|portable|\bslim\b|carry")
+
+# Follow-ups that move the preferences relative to where they are
+CHEAPER_PATTERN = re.compile(r"\b(?:cheaper|less expensive|lower (?:price|budget|cost)|more affordable|budget[- ]friendly)\b")
+PRICIER_PATTERN = re.compile(r"\b(?:more expensive|pricier|higher (?:price|budget)|more premium)\b")
+MORE_RAM_PATTERN = re.compile(r"\bmore (?:ram|memory)\b")
+MORE_STORAGE_PATTERN = re.compile(r"\bmore (?:storage|space)\b|\bbigger (?:ssd|storage)\b")
+FASTER_PATTERN = re.compile(r"\b(?:faster|more powerful|better performance|more performance)\b")
+LIGHTER_PATTERN = re.compile(r"\blighter\b")
+
+# Relative follow-ups move the budget by this fraction and a score range by this many points
+PRICE_STEP = 0.2
+SCORE_STEP = 15
+
+# Messages that are questions about laptops rather than requests for them
+NON_SEARCH_PATTERN = re.compile(r"\b(?:compare|comparison|difference|versus|vs|why|how|explain|what is|which is better)\b|\?")
+NEGATION_PATTERN = re.compile(r"\b(?:not|no|don'?t|without|except)\b")
+
+# Follow-ups phrased as questions: 'which one is cheaper', 'is 16GB enough'. Requests that
+# only sound like one ('can you show me cheaper ones?', 'what about 32GB RAM?') still ask for a search
+QUESTION_START_PATTERN = re.compile(r"^(?:which|what|why|how|is|are|does|do|did|should|would|will|can|could)\b")
+REQUEST_PATTERN = re.compile(r"^(?:(?:can|could|would|will) you (?:show|find|suggest|recommend|give|get)|(?:what|how) about)\b")
+
+
+def _amount(value: str, unit: Optional[str]) -> Optional[float]:
+    amount = float(value)
+    if unit:
+        amount *= 1000 if unit in ("k", "thousand") else 100000
+    elif amount < 1000:
+        # A bare small number is a spec or a count, not a price
+        return None
+    return amount
+
+
+def _clip_price(value: float) -> int:
+    return int(min(MAX_PRICE, max(MIN_PRICE, value)))
+
+
+def parse_budget(text: str) -> Optional[Tuple[int, int]]:
+    """Return the (min, max) price asked for in ``text``, e.g. 'under 1 lakh' -> (60000, 100000)."""
+    match = BETWEEN_PATTERN.search(text)
+    if match:
+        low, high = _amount(*match.group(1, 2)), _amount(*match.group(3, 4))
+        if high is not None and low is None and match.group(2) is None and match.group(4):
+            # "50 to 80k": the unit applies to both ends
+            low = _amount(match.group(1), match.group(4))
+        if low is not None and high is not None and low < high:
+            return _clip_price(low), _clip_price(high)
+
+    match = AROUND_PATTERN.search(text)
+    if match and _amount(*match.group(1, 2)):
+        amount = _amount(*match.group(1, 2))
+        return _clip_price(amount * 0.85), _clip_price(amount * 1.15)
+
+    match = MAX_PRICE_PATTERN.search(text)
+    if match and _amount(*match.group(1, 2)):
+        high = _amount(*match.group(1, 2))
+        return _clip_price(high * 0.6), _clip_price(high)
+
+    match = MIN_PRICE_PATTERN.search(text)
+    if match and _amount(*match.group(1, 2)):
+        return _clip_price(_amount(*match.group(1, 2))), MAX_PRICE
+
+    return None
+
+
+def parse_locally(message: str) -> Tuple[Optional[Dict], float]:
+    """Parse a request into the knowledge base JSON schema without the LLM.
+
+    Returns the preferences and a confidence in [0, 1]; callers should fall
+    back to the LLM parse when the confidence is below their threshold.
+    """
+    normalized = normalize_message(message)
+    if normalized in SAMPLE_QUERIES:
+        return copy.deepcopy(SAMPLE_QUERIES[normalized]), 1.0
+
+    text = message.lower().replace(",", "")
+    use_cases = [name for name, pattern in USE_CASE_KEYWORDS if re.search(r"\b(?:" + pattern + r")\b", text)]
+    budget = parse_budget(text)
+
+    preferences = copy.deepcopy(USE_CASES[use_cases[0]] if use_cases else USE_CASES["student"])
+    specs = preferences["specifications"]
+    confidence = 0.0
+    if use_cases:
+        confidence += 0.7 if len(use_cases) == 1 else 0.6
+
+    if budget:
+        confidence += 0.2
+        preferences["price_range"] = {"min": budget[0], "max": budget[1]}
+        if budget[1] < 1.5 * USE_CASES[use_cases[0] if use_cases else "student"]["price_range"]["min"]:
+            # A tight budget cannot buy the template's full performance
+            preferences["performance_range"]["min"] = max(0, preferences["performance_range"]["min"] - 20)
+
+    explicit = 0
+    match = RAM_PATTERN.search(text)
+    if match:
+        specs["RAM (in GB)"] = min(MAX_RAM, int(match.group(1) or match.group(2)))
+        explicit += 1
+
+    for value, unit in STORAGE_PATTERN.findall(text):
+        size = float(value) * (1024 if unit == "tb" else 1)
+        if size >= 128:
+            specs["Storage"] = str(int(min(MAX_STORAGE, size)))
+            explicit += 1
+            break
+
+    match = SCREEN_PATTERN.search(text)
+    if match:
+        specs["Screen Size (in inch)"] = float(match.group(1))
+        explicit += 1
+
+    match = PROCESSOR_PATTERN.search(text)
+    if match:
+        specs["processor_min"] = " ".join((match.group(1) or match.group(2) or "apple " + match.group(3)).split())
+        explicit += 1
+
+    if INTEGRATED_GPU_PATTERN.search(text):
+        specs["dedicated_graphics"] = False
+        explicit += 1
+    elif DEDICATED_GPU_PATTERN.search(text):
+        specs["dedicated_graphics"] = True
+        explicit += 1
+
+    if LIGHTWEIGHT_PATTERN.search(text):
+        preferences["portability_range"] = {"min": 60, "max": 100}
+        explicit += 1
+
+    confidence += 0.05 * explicit
+
+    if NON_SEARCH_PATTERN.search(text):
+        confidence *= 0.5
+    if NEGATION_PATTERN.search(text):
+        confidence *= 0.5
+    if len(text.split()) > 25:
+        confidence *= 0.7
+
+    return preferences, round(min(1.0, confidence), 2)
+
+
+def is_question(text: str) -> bool:
+    """True when a follow-up asks about the laptops already shown instead of asking for other ones."""
+    text = text.strip()
+    if REQUEST_PATTERN.match(text):
+        return False
+    return bool(NON_SEARCH_PATTERN.search(text) or QUESTION_START_PATTERN.match(text))
+
+
+def refine_budget(text: str, price_range: Dict) -> Optional[Tuple[int, int]]:
+    """Return the (min, max) price a follow-up asks for, or None when it does not mention the budget.
+
+    A new cap ('under 70k', 'cheaper') or floor ('above 80k') keeps the other
+    end of ``price_range`` where it was unless the two would cross.
+    """
+    low, high = price_range["min"], price_range["max"]
+    if BETWEEN_PATTERN.search(text) or AROUND_PATTERN.search(text):
+        budget = parse_budget(text)
+        if budget:
+            return budget
+
+    match = MAX_PRICE_PATTERN.search(text)
+    if match and _amount(*match.group(1, 2)):
+        high = _clip_price(_amount(*match.group(1, 2)))
+        return (low if low < high else _clip_price(high * 0.6)), high
+
+    match = MIN_PRICE_PATTERN.search(text)
+    if match and _amount(*match.group(1, 2)):
+        low = _clip_price(_amount(*match.group(1, 2)))
+        return low, (high if high > low else MAX_PRICE)
+
+    if CHEAPER_PATTERN.search(text):
+        high = _clip_price(high * (1 - PRICE_STEP))
+        return (low if low < high else _clip_price(high * 0.6)), high
+
+    if PRICIER_PATTERN.search(text):
+        return _clip_price(low * (1 + PRICE_STEP)), _clip_price(high * (1 + PRICE_STEP))
+
+    return None
+
+
+def _raised_range(score_range: Optional[Dict], default_min: int) -> Dict:
+    if not score_range:
+        return {"min": default_min, "max": 100}
+    low = min(100 - SCORE_STEP, score_range["min"] + SCORE_STEP)
+    return {"min": low, "max": max(low, score_range["max"])}
+
+
+def parse_refinement(message: str, preferences: Dict) -> Optional[Dict]:
+    """Parse a follow-up such as 'cheaper' or 'with 32GB RAM' into a preference delta.
+
+    The delta holds only what changes, in the knowledge base schema: whole
+    ``*_range`` objects and single ``specifications`` entries (see
+    recommendation.apply_delta). Returns None when the message asks for no
+    change to ``preferences``, e.g. a question about the current recommendations.
+
+    >>> session = {"price_range": {"min": 60000, "max": 100000}, "specifications": {"RAM (in GB)": 32}}
+    >>> parse_refinement("cheaper", session)
+    {'price_range': {'min': 60000, 'max': 80000}}
+    >>> parse_refinement("what about 16GB RAM?", session)
+    {'specifications': {'RAM (in GB)': 16}}
+    >>> for question in ["Which one has the best GPU?", "Which one is cheaper?",
+    ...                  "Is 16GB of RAM enough for Android Studio?", "Which is lighter?", "which one is faster"]:
+    ...     print(parse_refinement(question, session))
+    None
+    None
+    None
+    None
+    None
+    """
+    text = message.lower().replace(",", "")
+    if is_question(text):
+        return None
+    specs = preferences.get("specifications", {})
+    delta = {}
+    changed_specs = {}
+
+    price_range = preferences.get("price_range") or {"min": MIN_PRICE, "max": MAX_PRICE}
+    budget = refine_budget(text, price_range)
+    if budget and budget != (price_range["min"], price_range["max"]):
+        delta["price_range"] = {"min": budget[0], "max": budget[1]}
+
+    match = RAM_PATTERN.search(text)
+    if match:
+        changed_specs["RAM (in GB)"] = min(MAX_RAM, int(match.group(1) or match.group(2)))
+    elif MORE_RAM_PATTERN.search(text):
+        changed_specs["RAM (in GB)"] = min(MAX_RAM, 2 * int(specs.get("RAM (in GB)", 8)))
+
+    for value, unit in STORAGE_PATTERN.findall(text):
+        size = float(value) * (1024 if unit == "tb" else 1)
+        if size >= 128:
+            changed_specs["Storage"] = str(int(min(MAX_STORAGE, size)))
+            break
+    else:
+        if MORE_STORAGE_PATTERN.search(text):
+            changed_specs["Storage"] = str(int(min(MAX_STORAGE, 2 * float(specs.get("Storage", 256)))))
+
+    match = PROCESSOR_PATTERN.search(text)
+    if match:
+        changed_specs["processor_min"] = " ".join((match.group(1) or match.group(2) or "apple " + match.group(3)).split())
+
+    if INTEGRATED_GPU_PATTERN.search(text):
+        changed_specs["dedicated_graphics"] = False
+    elif DEDICATED_GPU_PATTERN.search(text) and not NEGATION_PATTERN.search(text):
+        changed_specs["dedicated_graphics"] = True
+
+    changed_specs = {key: value for key, value in changed_specs.items() if specs.get(key) != value}
+    if changed_specs:
+        delta["specifications"] = changed_specs
+
+    if LIGHTWEIGHT_PATTERN.search(text) or LIGHTER_PATTERN.search(text):
+        delta["portability_range"] = _raised_range(preferences.get("portability_range"), 60)
+
+    if FASTER_PATTERN.search(text):
+        delta["performance_range"] = _raised_range(preferences.get("performance_range"), 70)
+
+    return delta or None
+
+ORDINALS = {
+    "first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3, "fourth": 4, "4th": 4,
+    "fifth": 5, "5th": 5, "sixth": 6, "6th": 6, "seventh": 7, "7th": 7, "eighth": 8, "8th": 8,
+    "ninth": 9, "9th": 9, "tenth": 10, "10th": 10, "last": 0,
+}
+ORDINAL_PATTERN = re.compile(
+    r"\b(" + "|".join(ORDINALS) + r")\b(?:\s+(?:one|laptop|option|model|pick))?"
+    r"|(?:#|\bnumber\s*|\bno\.?\s*|\boption\s*)(\d{1,2})\b"
+)
+SIMILARITY_CUE_PATTERN = re.compile(r"\b(?:like|similar|same as|alternatives?|instead of|comparable)\b")
+
+# Phrases asking for a change relative to a laptop, keyed by recommendation.SIMILARITY_MODIFIERS
+MODIFIER_PATTERNS = [
+    ("cheaper", r"cheaper|less expensive|lower (?:price|cost)|more affordable|budget[- ]friendly"),
+    ("pricier", r"more expensive|pricier|more premium"),
+    ("faster", r"faster|more powerful|better performance|more performance|powerful"),
+    ("better_graphics", r"better (?:gpu|graphics)|stronger (?:gpu|graphics)|more gpu"),
+    ("lighter", r"lighter|more portable|less weight"),
+    ("bigger_screen", r"bigger (?:screen|display)|larger (?:screen|display)"),
+    ("smaller_screen", r"smaller (?:screen|display)|more compact|smaller"),
+    ("more_ram", r"more (?:ram|memory)"),
+    ("more_storage", r"more (?:storage|space)|bigger (?:ssd|storage)"),
+    ("longer_battery", r"(?:better|longer|more) battery"),
+]
+
+
+def parse_similarity_request(message: str) -> Optional[Tuple[int, List[str]]]:
+    """Recognise follow-ups such as 'something like the second one but cheaper'.
+
+    Returns the referenced position (0-based, -1 for 'the last one') and the
+    requested modifiers, or None when the message is not such a request.
+
+    >>> parse_similarity_request("something like the second one but cheaper")
+    (1, ['cheaper'])
+    >>> print(parse_similarity_request("Is the first one cheaper than the second?"))
+    None
+    >>> print(parse_similarity_request("Why is the first one more expensive?"))
+    None
+    """
+    text = message.lower()
+    if is_question(text):
+        return None
+    match = ORDINAL_PATTERN.search(text)
+    if match is None:
+        return None
+
+    modifiers = []
+    for name, pattern in MODIFIER_PATTERNS:
+        if re.search(r"\b(?:" + pattern + r")\b", text):
+            modifiers.append(name)
+    if not modifiers and not SIMILARITY_CUE_PATTERN.search(text):
+        return None
+
+    number = ORDINALS[match.group(1)] if match.group(1) else int(match.group(2))
+    if number == 0:
+        return -1, modifiers
+    return (number - 1, modifiers) if number >= 1 else None
@@ -0,0 +1,188 @@
+"""Chat model backends for offline testing.
+
+``ReplayChatModel`` answers from outputs recorded by ``RecordingChatModel``
+(JSONL, one call per line) after a configurable latency, so the full chat
+pipeline runs without network access. Prompts are matched exactly; anything
+not recorded gets a fixed parse or response output.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+# Start of the parse chain's template message (see chatbot.llm_chains); every other prompt is a response prompt
+PARSE_MARKER = 'Given this knowledge base:'
+
+# Answers for prompts that were never recorded
+DEFAULT_OUTPUTS = {
+    'parse': json.dumps({
+        "specifications": {"RAM (in GB)": 16, "Storage": "512", "Screen Size (in inch)": 15.6,
+                           "dedicated_graphics": True},
+        "price_range": {"min": 60000, "max": 100000},
+        "performance_range": {"min": 60, "max": 100},
+        "portability_range": {"min": 0, "max": 70},
+    }),
+    'response': (
+        "Here are three laptops that fit your needs. The **best match** has a dedicated GPU, "
+        "16GB of RAM and a 512GB SSD, and the other two trade a little performance for a lower price."
+    ),
+}
+
+
+def prompt_key(messages: Sequence[BaseMessage]) -> str:
+    """Stable hash of a prompt: every message's type and content."""
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(f"{message.type}\0{message.content}\0".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def prompt_chain(messages: Sequence[BaseMessage]) -> str:
+    """'parse' or 'response', the chain a prompt belongs to.
+
+    Only the template message, which follows the history, is checked, so a
+    user turn that mentions the knowledge base does not count.
+    """
+    return 'parse' if messages and str(messages[-1].content).startswith(PARSE_MARKER) else 'response'
+
+
+def split_chunks(text: str) -> List[str]:
+    """Split a reply into word-sized stream chunks."""
+    return re.findall(r'\s*\S+|\s+', text)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that replays recorded outputs after ``latency`` seconds.
+
+    Streamed replies arrive a word at a time, ``chunk_delay`` seconds apart.
+    ``hits`` and ``misses`` count prompts found in and missing from the
+    recordings.
+    """
+
+    recordings_path: Optional[str] = None
+    latency: float = 0.0
+    chunk_delay: float = 0.0
+
+    _outputs: Dict[str, str] = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    hits: int = 0
+    misses: int = 0
+
+    def model_post_init(self, context: Any) -> None:
+        if self.recordings_path:
+            with open(self.recordings_path, encoding='utf-8') as handle:
+                for line in handle:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._outputs[record['key']] = record['output']
+
+    @property
+    def _llm_type(self) -> str:
+        return 'replay'
+
+    def reply(self, messages: List[BaseMessage]) -> str:
+        output = self._outputs.get(prompt_key(messages))
+        with self._lock:
+            if output is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return output if output is not None else DEFAULT_OUTPUTS[prompt_chain(messages)]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply(messages)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for i, text in enumerate(split_chunks(self.reply(messages))):
+            if i and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for i, text in enumerate(split_chunks(self.reply(messages))):
+            if i and self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+class RecordingChatModel(BaseChatModel):
+    """Wraps a chat model and appends every prompt's output to ``path`` for ReplayChatModel."""
+
+    model: BaseChatModel
+    path: str
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return f'recording-{self.model._llm_type}'
+
+    def record(self, messages: List[BaseMessage], output: str) -> None:
+        record = {
+            'key': prompt_key(messages),
+            'chain': prompt_chain(messages),
+            # For people reading the file; replay only matches on the key
+            'prompt': str(messages[-1].content)[-200:] if messages else '',
+            'output': output,
+        }
+        with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(json.dumps(record) + '\n')
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        message = self.model.invoke(messages, stop=stop, **kwargs)
+        self.record(messages, message.content)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        message = await self.model.ainvoke(messages, stop=stop, **kwargs)
+        self.record(messages, message.content)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        parts = []
+        for message in self.model.stream(messages, stop=stop, **kwargs):
+            parts.append(message.content)
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                run_manager.on_llm_new_token(message.content, chunk=chunk)
+            yield chunk
+        self.record(messages, ''.join(parts))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        parts = []
+        async for message in self.model.astream(messages, stop=stop, **kwargs):
+            parts.append(message.content)
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                await run_manager.on_llm_new_token(message.content, chunk=chunk)
+            yield chunk
+        self.record(messages, ''.join(parts))
@@ -0,0 +1,108 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Filler words that do not change what the user is asking for
+STOPWORDS = {
+    'a', 'an', 'the', 'i', 'im', 'me', 'my', 'please', 'pls', 'need', 'want',
+    'looking', 'look', 'for', 'suggest', 'recommend', 'show', 'find', 'can',
+    'you', 'some', 'good', 'best', 'is', 'am', 'to', 'get',
+}
+
+
+def normalize_message(message: str) -> str:
+    """Reduce a user message to a cache key, e.g. 'Gaming laptop under 1 Lakh!' -> 'gaming laptop under 1 lakh'."""
+    text = unicodedata.normalize('NFKC', message).lower()
+    text = re.sub(r'[^\w₹.]+', ' ', text)
+    text = re.sub(r'(?<!\d)\.|\.(?!\d)', ' ', text)
+    return ' '.join(word for word in text.split() if word not in STOPWORDS)
+
+
+class ParseCache:
+    """LRU + TTL cache of parsed preferences keyed on the normalised user message.
+
+    Entries live in memory and, when ``path`` is given, are written through to a
+    SQLite file so they survive restarts and are shared by worker processes.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 24 * 3600, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS parse_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, message: str) -> Optional[Dict]:
+        key = normalize_message(message)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT value, created FROM parse_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1])
+                    self._store(key, entry)
+
+            if entry is None or now - entry[1] > self.ttl:
+                if entry is not None:
+                    self._evict(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return json.loads(json.dumps(entry[0]))
+
+    def put(self, message: str, parsed: Dict) -> None:
+        key = normalize_message(message)
+        entry = (json.loads(json.dumps(parsed)), time.time())
+        with self._lock:
+            self._store(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO parse_cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(entry[0]), entry[1]),
+                )
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM parse_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _store(self, key: str, entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _evict(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+            self._db.commit()
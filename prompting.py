@@ -0,0 +1,125 @@
+import re
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+# Rough per-message framing cost of the chat format, in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once; returns None when it is unavailable (e.g. offline)."""
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # About four characters per token for English text
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: Sequence["BaseMessage"]) -> int:
+    return sum(count_tokens(str(message.content)) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def summarize_turns(messages: Sequence["BaseMessage"], max_tokens: int = 200) -> str:
+    """Extractive summary of older turns: the questions the user asked, within ``max_tokens``."""
+    from langchain_core.messages import HumanMessage
+
+    questions = []
+    used = 0
+    for message in reversed(messages):
+        if not isinstance(message, HumanMessage):
+            continue
+        question = " ".join(str(message.content).split())
+        cost = count_tokens(question) + 1
+        if used + cost > max_tokens:
+            break
+        questions.append(question)
+        used += cost
+    return "; ".join(reversed(questions))
+
+
+class HistoryPolicy:
+    """Keep the last ``max_turns`` turns of history that fit in ``max_tokens``.
+
+    A turn starts at a human message. Turns that do not fit are dropped, or,
+    with a ``summarizer``, replaced by a single system message summarising them.
+    """
+
+    def __init__(self, max_turns: int = 6, max_tokens: int = 2000,
+                 summarizer: Optional[Callable[[Sequence["BaseMessage"]], str]] = None):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+
+    def apply(self, messages: Sequence["BaseMessage"]) -> List["BaseMessage"]:
+        from langchain_core.messages import HumanMessage, SystemMessage
+
+        turns = []
+        for message in messages:
+            if isinstance(message, HumanMessage) or not turns:
+                turns.append([])
+            turns[-1].append(message)
+
+        kept = []
+        budget = self.max_tokens
+        for turn in reversed(turns[-self.max_turns:] if self.max_turns > 0 else []):
+            cost = count_message_tokens(turn)
+            if cost > budget:
+                break
+            kept.insert(0, turn)
+            budget -= cost
+
+        window = [message for turn in kept for message in turn]
+        dropped = list(messages[:len(messages) - len(window)])
+        if dropped and self.summarizer is not None:
+            summary = self.summarizer(dropped)
+            if summary:
+                return [SystemMessage(f"Summary of earlier conversation: {summary}")] + window
+        return window
+
+
+RECOMMENDATION_COLUMNS = ["name", "price", "processor", "ram", "storage", "gpu", "screen", "weight", "battery"]
+
+
+def format_recommendations(recommendations: Optional[Dict]) -> str:
+    """Encode the recommendations as a compact pipe table; row 1 is the best match."""
+    if not recommendations:
+        return "none"
+
+    laptops = [recommendations["best_match"]] + recommendations["similar_recommendations"]
+    lines = [
+        f"total_matches: {recommendations['total_matches']}",
+        "|#|" + "|".join(RECOMMENDATION_COLUMNS) + "|",
+    ]
+    for rank, laptop in enumerate(laptops, 1):
+        specs = laptop["specifications"]
+        cells = [
+            re.sub(r"\s+", " ", laptop["name"]).replace("|", "/"),
+            f"₹{laptop['price']}",
+            specs["processor"],
+            specs["ram"],
+            specs["storage"],
+            specs["gpu"],
+            specs["screen_size"],
+            specs["weight"],
+            specs["battery"],
+        ]
+        lines.append(f"|{rank}|" + "|".join(cells) + "|")
+    return "\n".join(lines)
@@ -1,159 +1,1016 @@
-import pandas as pd
-from typing import Dict
-
-df = pd.read_csv('data/CleanedLaptopData.csv')
-
-def filter_laptops(preferences: Dict) -> Dict:
-    try:
-        filtered_df = df.copy()
-        print(f"\nDEBUG: Starting with {len(filtered_df)} laptops")
-        
-        # 1. Essential Filters
-        if 'price_range' in preferences:
-            filtered_df = filtered_df[
-                (filtered_df['Price (in Indian Rupees)'] >= preferences['price_range']['min']) &
-                (filtered_df['Price (in Indian Rupees)'] <= preferences['price_range']['max'])
-            ]
-            print(f"After price filter: {len(filtered_df)} laptops")
-
-        specs = preferences.get('specifications', {})
-        
-        # RAM Filter
-        if 'RAM (in GB)' in specs:
-            min_ram = float(specs['RAM (in GB)'])
-            filtered_df = filtered_df[filtered_df['RAM (in GB)'] >= min_ram]
-            print(f"After RAM filter: {len(filtered_df)} laptops")
-
-        # Storage Filter
-        if 'Storage' in specs:
-            min_storage = float(specs['Storage'])
-            filtered_df = filtered_df[filtered_df['Storage'] >= min_storage]
-            print(f"After storage filter: {len(filtered_df)} laptops")
-
-        if len(filtered_df) < 20:
-            print("Relaxing constraints")
-            return filter_laptops_with_relaxed_constraints(preferences)
-
-        if 'performance_range' in preferences:
-            min_perf = max(0, preferences['performance_range']['min'] - 10)  
-            max_perf = min(100, preferences['performance_range']['max'] + 10)
-            filtered_df = filtered_df[
-                (filtered_df['Performance_Score'] >= min_perf) &
-                (filtered_df['Performance_Score'] <= max_perf)
-            ]
-            print(f"After performance filter: {len(filtered_df)} laptops")
-
-        if 'portability_range' in preferences:
-            min_port = max(0, preferences['portability_range']['min'] - 10)  
-            max_port = min(100, preferences['portability_range']['max'] + 10)
-            filtered_df = filtered_df[
-                (filtered_df['Portability'] >= min_port) &
-                (filtered_df['Portability'] <= max_port)
-            ]
-            print(f"After portability filter: {len(filtered_df)} laptops")
-
-        # 4. Optional Filters 
-        if 'processor_min' in specs and len(filtered_df) > 10:  
-            processor_name = specs['processor_min'].lower()
-            if 'i' in processor_name or 'ryzen' in processor_name:
-                if 'i3' in processor_name:
-                    filtered_df = filtered_df[filtered_df['Processor name'].str.contains('i[3-9]', case=False, regex=True)]
-                elif 'i5' in processor_name:
-                    filtered_df = filtered_df[filtered_df['Processor name'].str.contains('i[5-9]', case=False, regex=True)]
-                elif 'i7' in processor_name:
-                    filtered_df = filtered_df[filtered_df['Processor name'].str.contains('i[7-9]', case=False, regex=True)]
-                elif 'i9' in processor_name:
-                    filtered_df = filtered_df[filtered_df['Processor name'].str.contains('i9', case=False)]
-                elif 'ryzen' in processor_name:
-                    filtered_df = filtered_df[filtered_df['Processor name'].str.contains('ryzen', case=False)]
-            print(f"After processor filter: {len(filtered_df)} laptops")
-
-        if specs.get('dedicated_graphics') and len(filtered_df) > 10:
-            filtered_df = filtered_df[filtered_df['Dedicated Graphic Memory Capacity'] > 0]
-            print(f"After GPU filter: {len(filtered_df)} laptops")
-
-        return format_results(filtered_df)
-
-    except Exception as e:
-        print(f"Error in filter_laptops: {str(e)}")
-        return {
-            "status": "error",
-            "message": str(e),
-            "filtered_laptops": []
-        }
-
-def filter_laptops_with_relaxed_constraints(preferences: Dict) -> Dict:
-    relaxed_preferences = preferences.copy()
-    
-    if 'price_range' in relaxed_preferences:
-        price_range = relaxed_preferences['price_range']
-        range_width = price_range['max'] - price_range['min']
-        price_range['min'] = max(15990, price_range['min'] - (range_width * 0.2))
-        price_range['max'] = min(301990, price_range['max'] + (range_width * 0.2))
-
-    if 'performance_range' in relaxed_preferences:
-        perf_range = relaxed_preferences['performance_range']
-        perf_range['min'] = max(0, perf_range['min'] - 20)
-        perf_range['max'] = min(100, perf_range['max'] + 20)
-
-    if 'portability_range' in relaxed_preferences:
-        port_range = relaxed_preferences['portability_range']
-        port_range['min'] = max(0, port_range['min'] - 20)
-        port_range['max'] = min(100, port_range['max'] + 20)
-
-    if 'specifications' in relaxed_preferences:
-        specs = relaxed_preferences['specifications']
-        if 'processor_min' in specs:
-            del specs['processor_min']
-
-    print("Applying relaxed constraints")
-    return filter_laptops(relaxed_preferences)
-
-def format_results(filtered_df: pd.DataFrame) -> Dict:
-    results = {
-        "status": "success",
-        "total_matches": len(filtered_df),
-        "filtered_laptops": []
-    }
-    
-    seen_configs = set()
-    
-    for _, laptop in filtered_df.iterrows():
-        config_signature = (
-            laptop['Processor name'].lower(),
-            laptop['RAM (in GB)'],
-            laptop['Storage'],
-            laptop['gpu name '].strip().lower() if not pd.isna(laptop['gpu name ']) else "integrated",
-            laptop['Screen Size (in inch)']
-        )
-        
-        if config_signature in seen_configs:
-            continue
-            
-        seen_configs.add(config_signature)
-        
-        laptop_dict = {
-            "name": laptop['name'],
-            "price": int(laptop['Price (in Indian Rupees)']),
-            "specifications": {
-                "processor": laptop['Processor name'],
-                "ram": f"{int(laptop['RAM (in GB)'])}GB",
-                "storage": f"{int(laptop['Storage'])}GB",
-                "gpu": laptop['gpu name '].strip() if not pd.isna(laptop['gpu name ']) else "Integrated Graphics",
-                "screen_size": f"{float(laptop['Screen Size (in inch)']):.1f}\"",
-                "weight": f"{float(laptop['Weight (in kg)']):.2f} kg",
-                "battery": f"{float(laptop['battery_backup']):.1f} hours"
-            },
-            "scores": {
-                "performance": float(laptop['Performance_Score']),
-                "portability": float(laptop['Portability']),
-                "value": float(laptop['Value_Score'])
-            }
-        }
-        
-        results["filtered_laptops"].append(laptop_dict)
-        
-        if len(results["filtered_laptops"]) >= 10:
-            break
-    
-    return results
+import copy
+import logging
+import os
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from catalogue import (
+    CPU_AMD_RYZEN, CPU_APPLE_M, CPU_FAMILY, CPU_INTEL_CORE, CPU_OTHER, CPU_RANKING, CPU_TIER, GPU_BENCHMARK,
+    GPU_MEMORY, INDEXED_COLUMNS, LAPTOP_ID, PERFORMANCE, PORTABILITY, PRICE, RAM, STORAGE, Catalogue,
+    CatalogueManager, Snapshot, classify_processor,
+)
+from metrics import relaxation_tier, stage_seconds
+
+logger = logging.getLogger(__name__)
+
+MIN_PRICE = 15990
+MAX_PRICE = 301990
+
+# Relaxation: widen constraints until this many laptops pass the essential
+# filters, or until another round would change nothing because every range is
+# at the catalogue bounds (about 22 rounds for a narrow price range)
+MIN_MATCHES = 20
+# Only reached by ranges that never settle, such as an inverted price range
+MAX_RELAXATION_TIER = 64
+
+# Ranking: laptops returned per request by default and at most
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 50
+
+# Base weight of each ranking signal; see ranking_weights
+RANKING_WEIGHTS = {
+    'performance': 1.0,
+    'portability': 1.0,
+    'value': 1.0,
+    'price': 1.0,
+    'rating': 0.5,
+}
+
+# Searches matching more laptops than this keep no candidates, so refining them scans the catalogue
+MAX_KEPT_CANDIDATES = 5000
+
+# Price facet buckets: each runs up to and including its edge, and the last one is open-ended
+PRICE_FACET_EDGES = [30000, 50000, 75000, 100000, 150000, 200000]
+
+# Batches are evaluated in chunks whose (queries x laptops) arrays stay around this size
+BATCH_MEMORY_BYTES = 64 * 1024 * 1024
+
+# Spec vector used to find similar laptops: (column, log-scaled) per dimension
+SIMILARITY_FEATURES = [
+    (CPU_RANKING, True),
+    (GPU_BENCHMARK, False),
+    (RAM, True),
+    (STORAGE, True),
+    ('Screen Size (in inch)', False),
+    ('Weight (in kg)', False),
+    ('battery_backup', False),
+    (PRICE, True),
+]
+DEFAULT_SIMILAR_K = 5
+
+# Changes a user can ask for relative to a laptop: (column, direction)
+SIMILARITY_MODIFIERS = {
+    'cheaper': (PRICE, 'below'),
+    'pricier': (PRICE, 'above'),
+    'faster': (PERFORMANCE, 'above'),
+    'better_graphics': (GPU_BENCHMARK, 'above'),
+    'lighter': ('Weight (in kg)', 'below'),
+    'bigger_screen': ('Screen Size (in inch)', 'above'),
+    'smaller_screen': ('Screen Size (in inch)', 'below'),
+    'more_ram': (RAM, 'above'),
+    'more_storage': (STORAGE, 'above'),
+    'longer_battery': ('battery_backup', 'above'),
+}
+
+
+class ColumnIndex:
+    """Sorted view of a numeric column for binary-search range lookups."""
+
+    def __init__(self, values: np.ndarray, order: Optional[np.ndarray] = None):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.order = np.argsort(self.values, kind='stable') if order is None else order
+        self.sorted_values = self.values[self.order]
+
+    def bounds(self, low: Optional[float] = None, high: Optional[float] = None) -> Tuple[int, int]:
+        start = 0 if low is None else int(np.searchsorted(self.sorted_values, low, side='left'))
+        stop = len(self.sorted_values) if high is None else int(np.searchsorted(self.sorted_values, high, side='right'))
+        return start, max(start, stop)
+
+    def lookup(self, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        start, stop = self.bounds(low, high)
+        return self.order[start:stop]
+
+    def contains(self, positions: np.ndarray, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        values = self.values[positions]
+        mask = np.ones(len(positions), dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+
+class LaptopIndex:
+    """Range index over the catalogue, built once at load time.
+
+    Lookups start from the most selective range (found by binary search) and
+    intersect it with the remaining ranges by probing only the surviving rows,
+    so the cost of a query follows the number of matches rather than the
+    catalogue size.
+    """
+
+    def __init__(self, catalogue: Catalogue, columns=INDEXED_COLUMNS):
+        self.size = catalogue.size
+        self.columns = {
+            column: ColumnIndex(catalogue.column(column), catalogue.orders.get(column))
+            for column in columns
+        }
+
+    def select(self, ranges: Dict[str, Tuple[Optional[float], Optional[float]]],
+               candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the sorted row positions that satisfy every (min, max) range."""
+        remaining = dict(ranges)
+        if candidates is None:
+            if not remaining:
+                return np.arange(self.size)
+            seed = min(remaining, key=lambda column: self._count(column, *remaining[column]))
+            candidates = self.columns[seed].lookup(*remaining.pop(seed))
+
+        for column, (low, high) in remaining.items():
+            candidates = candidates[self.columns[column].contains(candidates, low, high)]
+
+        return np.sort(candidates)
+
+    def _count(self, column: str, low: Optional[float], high: Optional[float]) -> int:
+        start, stop = self.columns[column].bounds(low, high)
+        return stop - start
+
+
+class SimilarityIndex:
+    """Nearest-neighbour search over standardised spec vectors (see SIMILARITY_FEATURES).
+
+    Every dimension is z-scored, after a log for the skewed ones, so each
+    contributes comparably to the euclidean distance. Queries scan all rows
+    with one vectorised distance computation and keep the k nearest with
+    np.argpartition.
+    """
+
+    def __init__(self, catalogue: Catalogue, features=SIMILARITY_FEATURES):
+        self.catalogue = catalogue
+        vectors = []
+        for column, log_scaled in features:
+            values = np.asarray(catalogue.column(column), dtype=np.float64)
+            if log_scaled:
+                values = np.log1p(np.maximum(values, 0))
+            spread = values.std()
+            vectors.append((values - values.mean()) / (spread if spread > 0 else 1))
+        self.vectors = np.column_stack(vectors).astype(np.float32)
+        self.ids = ColumnIndex(catalogue.column(LAPTOP_ID))
+
+    def position(self, laptop_id: int) -> Optional[int]:
+        """Row position of a laptop ID, or None when this version has no such laptop."""
+        positions = self.ids.lookup(laptop_id, laptop_id)
+        return int(positions[0]) if len(positions) else None
+
+    def nearest(self, position: int, k: int = DEFAULT_SIMILAR_K,
+                constraints: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None) -> np.ndarray:
+        """Positions of the ``k`` laptops closest to ``position``, nearest first.
+
+        The laptop itself and others with the same configuration are skipped;
+        ``constraints`` limits the results to (min, max) ranges of catalogue columns.
+        """
+        distances = np.square(self.vectors - self.vectors[position]).sum(axis=1)
+        signatures = self.catalogue.signatures
+        eligible = signatures != signatures[position]
+        for column, (low, high) in (constraints or {}).items():
+            values = self.catalogue.column(column)
+            if low is not None:
+                eligible &= values >= low
+            if high is not None:
+                eligible &= values <= high
+
+        candidates = np.flatnonzero(eligible)
+        distances = distances[candidates]
+        # Oversample so duplicate configurations can be dropped
+        pool = min(len(candidates), k * 4)
+        if pool < len(candidates):
+            top = np.argpartition(distances, pool - 1)[:pool]
+        else:
+            top = np.arange(len(candidates))
+        ordered = candidates[top[np.lexsort((candidates[top], distances[top]))]]
+        return ordered[first_occurrences(signatures[ordered])][:k]
+
+
+class FacetIndex:
+    """Facet bucket of every laptop, built once at load time (see facet_buckets).
+
+    The bucket codes of all facets are stored side by side per row, offset so
+    they never collide, so the counts of any set of rows are one np.bincount
+    over their codes. Counts for the whole catalogue are precomputed.
+    """
+
+    def __init__(self, catalogue: Catalogue):
+        facets = facet_buckets(catalogue)
+        self.names = list(facets)
+        self.buckets = {name: buckets for name, (_, buckets) in facets.items()}
+        sizes = [len(buckets) for _, buckets in facets.values()]
+        self.offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+        self.codes = np.empty((catalogue.size, len(facets)), dtype=np.uint16)
+        for i, ((codes, _), offset) in enumerate(zip(facets.values(), self.offsets)):
+            self.codes[:, i] = codes + offset
+        self.totals = np.bincount(self.codes.ravel(), minlength=sum(sizes))
+
+    def counts(self, positions: Optional[np.ndarray] = None) -> Dict[str, List[Dict]]:
+        """Every facet's buckets with the number of laptops at ``positions`` (all laptops by default) in each."""
+        if positions is None:
+            counts = self.totals
+        else:
+            counts = np.bincount(self.codes[positions].ravel(), minlength=len(self.totals))
+        return {
+            name: [dict(bucket, count=int(counts[offset + i])) for i, bucket in enumerate(self.buckets[name])]
+            for name, offset in zip(self.names, self.offsets)
+        }
+
+
+def facet_buckets(catalogue: Catalogue) -> Dict[str, Tuple[np.ndarray, List[Dict]]]:
+    """(bucket code of every row, buckets) per facet.
+
+    Each bucket has a "value" and a "label"; buckets that filter_laptops can
+    filter on also carry the preference delta selecting them under "filter"
+    (applied like a follow-up's, see apply_delta). RAM, storage and CPU
+    filters are minimums, the CPU one within its family.
+    """
+    column = catalogue.column
+    facets = {}
+
+    lows = [MIN_PRICE] + [edge + 1 for edge in PRICE_FACET_EDGES]
+    highs = PRICE_FACET_EDGES + [MAX_PRICE]
+    labels = ([f"Up to \u20b9{PRICE_FACET_EDGES[0] // 1000}k"]
+              + [f"\u20b9{low // 1000}k-{high // 1000}k" for low, high in zip(PRICE_FACET_EDGES, PRICE_FACET_EDGES[1:])]
+              + [f"Over \u20b9{PRICE_FACET_EDGES[-1] // 1000}k"])
+    facets['price'] = (np.searchsorted(PRICE_FACET_EDGES, column(PRICE), side='left'), [
+        {"value": i, "label": label, "filter": {"price_range": {"min": low, "max": high}}}
+        for i, (label, low, high) in enumerate(zip(labels, lows, highs))
+    ])
+
+    values, codes = distinct_values(column(RAM).astype(int))
+    facets['ram'] = (codes, [
+        {"value": int(value), "label": f"{value}GB", "filter": {"specifications": {RAM: int(value)}}}
+        for value in values
+    ])
+
+    values, codes = distinct_values(column(STORAGE).astype(int))
+    facets['storage'] = (codes, [
+        {"value": int(value), "label": f"{value}GB", "filter": {"specifications": {STORAGE: str(value)}}}
+        for value in values
+    ])
+
+    values, codes = distinct_values(np.round(column('Screen Size (in inch)'), 1))
+    facets['screen_size'] = (codes, [{"value": float(value), "label": f'{value:.1f}"'} for value in values])
+
+    facets['gpu'] = ((column(GPU_MEMORY) > 0).astype(int), [
+        {"value": "integrated", "label": "Integrated graphics"},
+        {"value": "dedicated", "label": "Dedicated graphics", "filter": {"specifications": {"dedicated_graphics": True}}},
+    ])
+
+    families, tiers = column(CPU_FAMILY).astype(int), column(CPU_TIER).astype(int)
+    values, codes = distinct_values(families * 16 + tiers)
+    facets['cpu'] = (codes, [cpu_bucket(int(value) // 16, int(value) % 16) for value in values])
+
+    # The brand is the first word of the name
+    values, codes = distinct_values(catalogue.strings['name'].first_words())
+    brands = [value.decode('utf-8', errors='ignore') for value in values]
+    facets['brand'] = (codes, [
+        {"value": brand, "label": brand.upper() if len(brand) <= 3 else brand.capitalize()} for brand in brands
+    ])
+    return facets
+
+
+def distinct_values(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(sorted distinct values, each row's index into them)."""
+    uniques, codes = np.unique(values, return_inverse=True)
+    return uniques, codes.reshape(-1)
+
+
+def cpu_bucket(family: int, tier: int) -> Dict:
+    """CPU facet bucket of a (family, tier) code pair, with a processor_min filter for known families."""
+    if family == CPU_INTEL_CORE:
+        label, processor = f"Core i{tier}", f"i{tier}"
+    elif family == CPU_AMD_RYZEN:
+        label, processor = (f"Ryzen {tier}", f"ryzen {tier}") if tier else ("Ryzen", "ryzen")
+    elif family == CPU_APPLE_M:
+        label, processor = ("Apple M Pro/Max", "apple m1 pro") if tier >= 9 else ("Apple M", "apple m1")
+    else:
+        return {"value": f"{family}-{tier}", "label": "Other"}
+    return {"value": f"{family}-{tier}", "label": label, "filter": {"specifications": {"processor_min": processor}}}
+
+
+class SearchIndexes:
+    """Indexes built for each catalogue version: range filters, similarity search and facet counts."""
+
+    def __init__(self, catalogue: Catalogue):
+        self.ranges = LaptopIndex(catalogue)
+        self.similar = SimilarityIndex(catalogue)
+        self.facets = FacetIndex(catalogue)
+
+
+# Versioned catalogue shared by all workers; new versions are picked up without a restart
+catalogues = CatalogueManager(
+    prepare=SearchIndexes,
+    refresh_interval=float(os.getenv("CATALOGUE_REFRESH_INTERVAL", "5")),
+)
+
+
+def filter_laptops(preferences: Dict, snapshot: Optional[Snapshot] = None, top_k: Optional[int] = None,
+                   keep_candidates: bool = False, relax: bool = True) -> Dict:
+    """Rank the laptops matching ``preferences``; with ``keep_candidates`` the results also carry
+    the positions passing the essential and score filters under "candidates", for refine_laptops.
+    With ``relax`` off the essential filters are never widened, however few laptops match."""
+    # The whole call runs against one snapshot, even if a new version is swapped in meanwhile
+    snapshot = snapshot or catalogues.current()
+    index = snapshot.index.ranges
+    requested = preferences
+    try:
+        logger.debug("Starting with %d laptops (catalogue %s)", index.size, snapshot.version)
+
+        # 1. Essential Filters, relaxed as far as needed to keep MIN_MATCHES rows
+        with stage_seconds.time(stage='filter_relaxation'):
+            if relax:
+                tier, preferences, candidates = plan_relaxation(preferences, index)
+            else:
+                tier, candidates = 0, index.select(essential_ranges(preferences))
+        relaxation_tier.observe(tier)
+        logger.debug("After price, RAM and storage filters: %d laptops (relaxation tier %d)", len(candidates), tier)
+
+        # 2. Score Filters
+        with stage_seconds.time(stage='filter_scores'):
+            candidates = index.select(score_ranges(preferences), candidates)
+        logger.debug("After performance and portability filters: %d laptops", len(candidates))
+        matched = candidates
+
+        # 4. Optional Filters
+        candidates = optional_filters(candidates, preferences.get('specifications', {}), index)
+
+        # 5. Ranking against what was asked for, not the relaxed constraints
+        top_k = min(MAX_TOP_K, max(1, int(top_k or DEFAULT_TOP_K)))
+        with stage_seconds.time(stage='format_results'):
+            results = format_results(candidates, limit=top_k, catalogue=snapshot.catalogue, preferences=requested)
+        results["relaxation_tier"] = tier
+        results["catalogue_version"] = snapshot.version
+        if keep_candidates:
+            results["candidates"] = kept_candidates(matched, snapshot)
+        return results
+
+    except Exception as e:
+        logger.warning("Error in filter_laptops: %s", e)
+        return {
+            "status": "error",
+            "message": str(e),
+            "filtered_laptops": [],
+            "catalogue_version": snapshot.version
+        }
+
+def facet_counts(preferences: Optional[Dict] = None, snapshot: Optional[Snapshot] = None,
+                 rank_matches: bool = False, top_k: Optional[int] = None) -> Dict:
+    """Facet buckets (see facet_buckets) with counts of the laptops matching ``preferences``.
+
+    Laptops are matched as filter_laptops does before any relaxation; without
+    preferences the precomputed counts of the whole catalogue are returned.
+    With ``rank_matches`` the ``top_k`` best of exactly those laptops are also
+    returned under "recommendations", shaped like filter_laptops results.
+    Raises ValueError for malformed preferences.
+    """
+    snapshot = snapshot or catalogues.current()
+    with stage_seconds.time(stage='facets'):
+        positions = None
+        if preferences:
+            try:
+                ranges = preference_ranges(preferences)
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid preferences: {e!r}") from e
+            for column, bounds in ranges.items():
+                if any(isinstance(bound, bool) or not isinstance(bound, (int, float)) for bound in bounds if bound is not None):
+                    raise ValueError(f"Invalid preferences: {column} bounds must be numbers, got {bounds}")
+            positions = snapshot.index.ranges.select(ranges)
+        results = {
+            "matches": snapshot.catalogue.size if positions is None else len(positions),
+            "facets": snapshot.index.facets.counts(positions),
+            "catalogue_version": snapshot.version,
+        }
+    if rank_matches:
+        if positions is None:
+            positions = np.arange(snapshot.catalogue.size)
+        top_k = min(MAX_TOP_K, max(1, int(top_k or DEFAULT_TOP_K)))
+        with stage_seconds.time(stage='format_results'):
+            ranked = format_results(positions, limit=top_k, catalogue=snapshot.catalogue, preferences=preferences or None)
+        ranked["relaxation_tier"] = 0
+        ranked["catalogue_version"] = snapshot.version
+        results["recommendations"] = ranked
+    return results
+
+def kept_candidates(candidates: np.ndarray, snapshot: Snapshot) -> Dict:
+    """The matching positions of a search in a JSON-friendly form; positions are None above MAX_KEPT_CANDIDATES."""
+    return {
+        "catalogue_version": snapshot.version,
+        "positions": candidates.tolist() if len(candidates) <= MAX_KEPT_CANDIDATES else None,
+    }
+
+def refine_laptops(preferences: Dict, delta: Dict, candidates: Optional[Dict] = None,
+                   snapshot: Optional[Snapshot] = None, top_k: Optional[int] = None) -> Dict:
+    """filter_laptops results for ``preferences`` changed by a follow-up's ``delta``.
+
+    A follow-up that loosens any constraint runs a full, relaxing search. One
+    that only tightens constraints is never relaxed: it returns exactly the
+    laptops meeting the new preferences, which may be none, as
+    ``filter_laptops(..., relax=False)`` would. ``candidates`` are the
+    previous search's matches as kept by filter_laptops; they include every
+    laptop that can still match, so when they are at hand only those rows are
+    probed. The results carry the merged preferences under "preferences", the
+    new "candidates", and "refinement": "incremental" or "full".
+    """
+    snapshot = snapshot or catalogues.current()
+    refined = apply_delta(preferences, delta)
+    if not tightens(preferences, refined):
+        results = filter_laptops(refined, snapshot, top_k, keep_candidates=True)
+        results["refinement"] = "full"
+        results["preferences"] = refined
+        return results
+
+    positions = (candidates or {}).get("positions")
+    if positions is None or candidates["catalogue_version"] != snapshot.version:
+        results = filter_laptops(refined, snapshot, top_k, keep_candidates=True, relax=False)
+        results["refinement"] = "full"
+        results["preferences"] = refined
+        return results
+
+    index = snapshot.index.ranges
+    with stage_seconds.time(stage='filter_refine'):
+        ranges = essential_ranges(refined)
+        ranges.update(score_ranges(refined))
+        matched = index.select(ranges, np.asarray(positions, dtype=np.intp))
+    logger.debug("Refined %d kept candidates to %d laptops", len(positions), len(matched))
+    matches = optional_filters(matched, refined.get('specifications', {}), index)
+
+    top_k = min(MAX_TOP_K, max(1, int(top_k or DEFAULT_TOP_K)))
+    with stage_seconds.time(stage='format_results'):
+        results = format_results(matches, limit=top_k, catalogue=snapshot.catalogue, preferences=refined)
+    results["relaxation_tier"] = 0
+    results["catalogue_version"] = snapshot.version
+    results["candidates"] = kept_candidates(matched, snapshot)
+    results["refinement"] = "incremental"
+    results["preferences"] = refined
+    return results
+
+def filter_laptops_batch(preferences_list: List[Dict], top_k: Optional[int] = None,
+                         snapshot: Optional[Snapshot] = None, chunk_size: Optional[int] = None) -> List[Dict]:
+    """Run filter_laptops for many preference objects at once; results are in input order.
+
+    Each query's bounds are broadcast against the catalogue columns, so the
+    relaxation, score and optional filters run as (queries x laptops) array
+    operations. Queries are processed ``chunk_size`` at a time (by default
+    sized to BATCH_MEMORY_BYTES) to cap memory. Every result equals what
+    filter_laptops returns for that query; results showing the same laptop
+    share its record, so treat them as read-only.
+    """
+    snapshot = snapshot or catalogues.current()
+    top_k = min(MAX_TOP_K, max(1, int(top_k or DEFAULT_TOP_K)))
+    # A few float64 score arrays per (query, laptop) pair are live at once
+    chunk_size = chunk_size or max(1, BATCH_MEMORY_BYTES // (48 * max(1, snapshot.catalogue.size)))
+
+    results = []
+    with stage_seconds.time(stage='filter_batch'):
+        for start in range(0, len(preferences_list), chunk_size):
+            results.extend(_filter_chunk(preferences_list[start:start + chunk_size], top_k, snapshot))
+    return results
+
+def _query_bounds(preferences: Dict) -> Tuple:
+    """The numbers filter_laptops derives from one preference object, for filter_laptops_batch."""
+    def bound(name: str, key: str, missing: float) -> float:
+        if name not in preferences:
+            return missing
+        value = preferences[name][key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"{name} {key} must be a number, got {value!r}")
+        return value
+
+    specs = preferences.get('specifications', {})
+    family, cpu_tier = classify_processor(specs['processor_min']) if 'processor_min' in specs else (CPU_OTHER, 0)
+    return (
+        'price_range' in preferences,
+        bound('price_range', 'min', -np.inf),
+        bound('price_range', 'max', np.inf),
+        float(specs[RAM]) if RAM in specs else -np.inf,
+        float(specs[STORAGE]) if STORAGE in specs else -np.inf,
+        bound('performance_range', 'min', np.nan),
+        bound('performance_range', 'max', np.nan),
+        bound('portability_range', 'min', np.nan),
+        bound('portability_range', 'max', np.nan),
+        'processor_min' in specs,
+        family,
+        cpu_tier,
+        bool(specs.get('dedicated_graphics')),
+    )
+
+def _relaxed_score_bounds(low: np.ndarray, high: np.ndarray, tiers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Score range after each query's relaxation rounds, widened by the score filter's 10 points."""
+    for step in range(int(tiers.max(initial=0))):
+        active = tiers > step
+        low = np.where(active, np.maximum(0, low - 20), low)
+        high = np.where(active, np.minimum(100, high + 20), high)
+    low = np.where(np.isnan(low), -np.inf, np.maximum(0, low - 10))
+    high = np.where(np.isnan(high), np.inf, np.minimum(100, high + 10))
+    return low, high
+
+def _filter_chunk(chunk: List[Dict], top_k: int, snapshot: Snapshot) -> List[Dict]:
+    catalogue = snapshot.catalogue
+    column = catalogue.column
+    results = [None] * len(chunk)
+    valid, bounds = [], []
+    for i, preferences in enumerate(chunk):
+        try:
+            bounds.append(_query_bounds(preferences))
+            valid.append(i)
+        except Exception as e:
+            results[i] = {
+                "status": "error",
+                "message": str(e),
+                "filtered_laptops": [],
+                "catalogue_version": snapshot.version
+            }
+    if not valid:
+        return results
+
+    (has_price, price_min, price_max, ram_min, storage_min, perf_min, perf_max, port_min, port_max,
+     has_processor, family, cpu_tier, dedicated) = (np.array(values) for values in zip(*bounds))
+
+    # 1. Essential filters: RAM and storage are never relaxed, the price range
+    # widens by a fifth of its width per tier. Laptops are laid out in price
+    # order, so a price range is a slice and its matches a cumulative-count lookup
+    price = snapshot.index.ranges.columns[PRICE]
+    essential = ((column(RAM)[price.order] >= ram_min[:, None]) &
+                 (column(STORAGE)[price.order] >= storage_min[:, None]))
+    counts = np.zeros((len(valid), catalogue.size + 1), dtype=np.int32)
+    np.cumsum(essential, axis=1, out=counts[:, 1:])
+
+    # Relax round by round, as relaxation_tiers does, until no query's ranges
+    # change; each query's last tier is the last round that changed its own
+    lows, highs = [price_min], [price_max]
+    scores = [value.astype(np.float64) for value in (perf_min, perf_max, port_min, port_max)]
+    last_tiers = has_processor.astype(np.int64)
+    for step in range(1, MAX_RELAXATION_TIER + 1):
+        low, high = lows[-1], highs[-1]
+        width = high - low
+        low = np.where(has_price, np.maximum(MIN_PRICE, low - width * 0.2), low)
+        high = np.where(has_price, np.minimum(MAX_PRICE, high + width * 0.2), high)
+        relaxed = [np.maximum(0, scores[0] - 20), np.minimum(100, scores[1] + 20),
+                   np.maximum(0, scores[2] - 20), np.minimum(100, scores[3] + 20)]
+        changed = (low != lows[-1]) | (high != highs[-1])
+        for before, after in zip(scores, relaxed):
+            changed |= ~np.isnan(before) & (after != before)
+        # Round 1 is kept even when it only drops processor_min
+        if step > 1 and not changed.any():
+            break
+        last_tiers = np.where(changed, step, last_tiers)
+        lows.append(low)
+        highs.append(high)
+        scores = relaxed
+    starts = np.searchsorted(price.sorted_values, np.stack(lows), side='left')
+    stops = np.searchsorted(price.sorted_values, np.stack(highs), side='right')
+
+    rows = np.arange(len(valid))
+    matches = counts[rows, np.maximum(starts, stops)] - counts[rows, starts]
+    enough = matches >= MIN_MATCHES
+    tiers = np.where(enough.any(axis=0), enough.argmax(axis=0), last_tiers)
+
+    in_range = np.arange(catalogue.size)
+    in_range = (in_range >= starts[tiers, rows][:, None]) & (in_range < stops[tiers, rows][:, None])
+    mask = np.empty_like(essential)
+    mask[:, price.order] = essential & in_range
+
+    # 2. Score filters on the relaxed ranges
+    for name, score_min, score_max in ((PERFORMANCE, perf_min, perf_max), (PORTABILITY, port_min, port_max)):
+        low, high = _relaxed_score_bounds(score_min.astype(np.float64), score_max.astype(np.float64), tiers)
+        mask &= (column(name) >= low[:, None]) & (column(name) <= high[:, None])
+
+    # 3. Optional filters, skipped once few laptops are left; relaxation drops the processor
+    applies = (tiers == 0) & (family != CPU_OTHER) & (mask.sum(axis=1) > 10)
+    if applies.any():
+        mask[applies] &= ((column(CPU_FAMILY) == family[applies, None]) &
+                          (column(CPU_TIER) >= cpu_tier[applies, None]))
+    applies = dedicated & (mask.sum(axis=1) > 10)
+    if applies.any():
+        mask[applies] &= column(GPU_MEMORY) > 0
+
+    # 4. Ranking, as rank_candidates does for one query: all candidates of all
+    # queries are scored and sorted together (query, best score, catalogue order),
+    # then each query keeps its first laptop per configuration, up to top_k
+    queries, positions = np.nonzero(mask)
+    scores = score_pairs([chunk[i] for i in valid], queries, positions, catalogue)
+    # np.nonzero lists each query's laptops in catalogue order and lexsort is stable
+    order = np.lexsort((-scores, queries))
+    queries, positions = queries[order], positions[order]
+    by_configuration = np.lexsort((catalogue.signatures[positions], queries))
+    repeated = np.zeros(len(order), dtype=bool)
+    repeated[by_configuration[1:]] = (
+        (queries[by_configuration[1:]] == queries[by_configuration[:-1]]) &
+        (catalogue.signatures[positions[by_configuration[1:]]] ==
+         catalogue.signatures[positions[by_configuration[:-1]]])
+    )
+    queries, positions = queries[~repeated], positions[~repeated]
+    first = np.searchsorted(queries, queries)
+    shown = np.arange(len(queries)) - first < top_k
+    queries, positions = queries[shown], positions[shown]
+    matches = mask.sum(axis=1)
+    ends = np.searchsorted(queries, rows, side='right')
+    # A laptop shown for several queries is described once and its record shared
+    described, shown = np.unique(positions, return_inverse=True)
+    laptops = list(map(describe_laptops(described, catalogue).__getitem__, shown.tolist()))
+
+    start = 0
+    for row, i in enumerate(valid):
+        results[i] = {
+            "status": "success",
+            "total_matches": int(matches[row]),
+            "filtered_laptops": laptops[start:ends[row]],
+            "relaxation_tier": int(tiers[row]),
+            "catalogue_version": snapshot.version
+        }
+        start = ends[row]
+    return results
+
+def score_pairs(preferences_list: List[Dict], queries: np.ndarray, positions: np.ndarray,
+                catalogue: Catalogue) -> np.ndarray:
+    """score_candidates for many (query, laptop) pairs at once.
+
+    ``queries`` indexes ``preferences_list`` and ``positions`` the catalogue.
+    Signals a query does not use get weight 0, which leaves its sums unchanged,
+    so each score equals the one score_candidates gives that laptop.
+    """
+    column = catalogue.column
+    weights = [ranking_weights(preferences) for preferences in preferences_list]
+    signals = [
+        ('value', column('Value_Score')[positions] / 100, None),
+        ('rating', column('user rating')[positions] / 5, None),
+    ]
+    for signal, name in (('performance', PERFORMANCE), ('portability', PORTABILITY)):
+        ranges = [preferences.get(f'{signal}_range') for preferences in preferences_list]
+        centre = np.array([(r['min'] + r['max']) / 2 if r else 0.0 for r in ranges])
+        signals.append((signal, 1 - np.minimum(1, np.abs(column(name)[positions] - centre[queries]) / 100), ranges))
+
+    ranges = [preferences.get('price_range') for preferences in preferences_list]
+    centre = np.array([(r['min'] + r['max']) / 2 if r else 0.0 for r in ranges])
+    half_width = np.array([max(1.0, (r['max'] - r['min']) / 2) if r else 1.0 for r in ranges])
+    distance = np.abs(column(PRICE)[positions] - centre[queries]) / half_width[queries]
+    signals.append(('price', np.maximum(0, 1 - distance / 2), ranges))
+
+    scores = np.zeros(len(positions))
+    totals = np.zeros(len(preferences_list))
+    for signal, values, ranges in signals:
+        # A query without the range has no such signal, as in score_candidates
+        weight = np.array([w[signal] if ranges is None or ranges[q] else 0.0 for q, w in enumerate(weights)])
+        totals += weight
+        scores += weight[queries] * values
+    total = totals[queries]
+    np.divide(scores, total, out=scores, where=total != 0)
+    return scores
+
+def essential_ranges(preferences: Dict) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """Price, RAM and storage ranges of ``preferences``, the filters relaxation counts matches against."""
+    ranges = {}
+    if 'price_range' in preferences:
+        ranges[PRICE] = (preferences['price_range']['min'], preferences['price_range']['max'])
+
+    specs = preferences.get('specifications', {})
+
+    # RAM Filter
+    if RAM in specs:
+        ranges[RAM] = (float(specs[RAM]), None)
+
+    # Storage Filter
+    if STORAGE in specs:
+        ranges[STORAGE] = (float(specs[STORAGE]), None)
+
+    return ranges
+
+def relax_constraints(preferences: Dict, tier: int) -> Dict:
+    """Return a copy of ``preferences`` widened by ``tier`` relaxation rounds."""
+    relaxed_preferences = copy.deepcopy(preferences)
+
+    for _ in range(tier):
+        if 'price_range' in relaxed_preferences:
+            price_range = relaxed_preferences['price_range']
+            range_width = price_range['max'] - price_range['min']
+            price_range['min'] = max(MIN_PRICE, price_range['min'] - (range_width * 0.2))
+            price_range['max'] = min(MAX_PRICE, price_range['max'] + (range_width * 0.2))
+
+        if 'performance_range' in relaxed_preferences:
+            perf_range = relaxed_preferences['performance_range']
+            perf_range['min'] = max(0, perf_range['min'] - 20)
+            perf_range['max'] = min(100, perf_range['max'] + 20)
+
+        if 'portability_range' in relaxed_preferences:
+            port_range = relaxed_preferences['portability_range']
+            port_range['min'] = max(0, port_range['min'] - 20)
+            port_range['max'] = min(100, port_range['max'] + 20)
+
+        if 'specifications' in relaxed_preferences:
+            specs = relaxed_preferences['specifications']
+            if 'processor_min' in specs:
+                del specs['processor_min']
+
+    return relaxed_preferences
+
+def relaxation_tiers(preferences: Dict) -> List[Dict]:
+    """``preferences`` relaxed 0, 1, 2, ... rounds, up to the first round after which relaxing changes nothing."""
+    tiers = [relax_constraints(preferences, 0)]
+    while len(tiers) <= MAX_RELAXATION_TIER:
+        relaxed = relax_constraints(tiers[-1], 1)
+        if relaxed == tiers[-1]:
+            break
+        tiers.append(relaxed)
+    return tiers
+
+def apply_delta(preferences: Dict, delta: Dict) -> Dict:
+    """Return a copy of ``preferences`` with a follow-up's ``delta`` (see intent_parser.parse_refinement) applied."""
+    refined = copy.deepcopy(preferences)
+    for key, value in delta.items():
+        if key == 'specifications':
+            refined.setdefault('specifications', {}).update(value)
+        else:
+            refined[key] = copy.deepcopy(value)
+    return refined
+
+def score_ranges(preferences: Dict) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """Performance and portability ranges filter_laptops applies, with 10 points of slack on each side."""
+    ranges = {}
+    for key, column in (('performance_range', PERFORMANCE), ('portability_range', PORTABILITY)):
+        if key in preferences:
+            ranges[column] = (max(0, preferences[key]['min'] - 10), min(100, preferences[key]['max'] + 10))
+    return ranges
+
+def optional_filters(candidates: np.ndarray, specs: Dict, index: LaptopIndex) -> np.ndarray:
+    """Apply the processor and dedicated graphics filters, each only while more than 10 candidates remain."""
+    if 'processor_min' in specs and len(candidates) > 10:
+        with stage_seconds.time(stage='filter_processor'):
+            family, cpu_tier = classify_processor(specs['processor_min'])
+            if family != CPU_OTHER:
+                candidates = index.select({CPU_FAMILY: (family, family), CPU_TIER: (cpu_tier, None)}, candidates)
+        logger.debug("After processor filter: %d laptops", len(candidates))
+
+    if specs.get('dedicated_graphics') and len(candidates) > 10:
+        with stage_seconds.time(stage='filter_gpu'):
+            candidates = candidates[index.columns[GPU_MEMORY].values[candidates] > 0]
+        logger.debug("After GPU filter: %d laptops", len(candidates))
+    return candidates
+
+def preference_ranges(preferences: Dict) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """Column ranges of every filter filter_laptops applies for ``preferences``, without relaxation."""
+    ranges = essential_ranges(preferences)
+    ranges.update(score_ranges(preferences))
+
+    specs = preferences.get('specifications', {})
+    if specs.get('processor_min'):
+        family, cpu_tier = classify_processor(specs['processor_min'])
+        if family != CPU_OTHER:
+            ranges[CPU_FAMILY] = (family, family)
+            ranges[CPU_TIER] = (cpu_tier, None)
+    if specs.get('dedicated_graphics'):
+        # Any dedicated graphics memory at all
+        ranges[GPU_MEMORY] = (np.nextafter(0.0, 1.0), None)
+    return ranges
+
+def tightens(preferences: Dict, refined: Dict) -> bool:
+    """True when every constraint changed from ``preferences`` to ``refined`` is a tighter one."""
+    for key in ('price_range', 'performance_range', 'portability_range'):
+        before, after = preferences.get(key), refined.get(key)
+        if after == before:
+            continue
+        if not after or (before and (after['min'] < before['min'] or after['max'] > before['max'])):
+            return False
+
+    specs, refined_specs = preferences.get('specifications', {}), refined.get('specifications', {})
+    for name in (RAM, STORAGE):
+        before, after = specs.get(name), refined_specs.get(name)
+        if after == before:
+            continue
+        if after is None or (before is not None and float(after) < float(before)):
+            return False
+
+    before, after = specs.get('processor_min'), refined_specs.get('processor_min')
+    if after != before:
+        family, cpu_tier = classify_processor(after) if after else (CPU_OTHER, 0)
+        if family == CPU_OTHER:
+            return False
+        if before:
+            before_family, before_tier = classify_processor(before)
+            if before_family not in (CPU_OTHER, family) or (before_family == family and cpu_tier < before_tier):
+                return False
+
+    return not (specs.get('dedicated_graphics') and not refined_specs.get('dedicated_graphics'))
+
+def plan_relaxation(preferences: Dict, index: Optional[LaptopIndex] = None) -> Tuple[int, Dict, np.ndarray]:
+    """Pick the tightest relaxation tier whose essential filters keep MIN_MATCHES rows.
+
+    Every tier up to relaxation_tiers' last is evaluated in one pass: the
+    loosest tier is looked up through the index, and each tighter tier is a
+    mask over those candidates. Falls back to the loosest tier when none
+    reaches MIN_MATCHES. Returns the tier, the
+    relaxed preferences and the candidate positions for that tier; the caller's
+    preferences are never modified.
+    """
+    index = index or catalogues.current().index.ranges
+    tiers = relaxation_tiers(preferences)
+    tier_ranges = [essential_ranges(relaxed) for relaxed in tiers]
+    candidates = index.select(tier_ranges[-1])
+
+    masks = np.ones((len(tiers), len(candidates)), dtype=bool)
+    for column in tier_ranges[-1]:
+        lows = np.array([ranges[column][0] for ranges in tier_ranges], dtype=np.float64)
+        highs = np.array([np.inf if ranges[column][1] is None else ranges[column][1] for ranges in tier_ranges],
+                         dtype=np.float64)
+        values = index.columns[column].values[candidates]
+        masks &= (values >= lows[:, None]) & (values <= highs[:, None])
+
+    eligible = np.flatnonzero(masks.sum(axis=1) >= MIN_MATCHES)
+    tier = int(eligible[0]) if len(eligible) else len(tiers) - 1
+    return tier, tiers[tier], candidates[masks[tier]]
+
+def ranking_weights(preferences: Dict) -> Dict[str, float]:
+    """Weight each ranking signal by how much the preferences care about it.
+
+    Signals without a corresponding preference get no weight, and the higher
+    the requested performance or portability, the more that score counts.
+    """
+    weights = dict(RANKING_WEIGHTS)
+    for signal in ('performance', 'portability'):
+        score_range = preferences.get(f'{signal}_range')
+        if score_range:
+            weights[signal] *= 1 + (score_range['min'] + score_range['max']) / 200
+        else:
+            weights[signal] = 0.0
+    if not preferences.get('price_range'):
+        weights['price'] = 0.0
+    return weights
+
+def score_candidates(candidates: np.ndarray, preferences: Dict, catalogue: Catalogue) -> np.ndarray:
+    """Weighted score in [0, 1] of each candidate; higher is a better fit."""
+    weights = ranking_weights(preferences)
+    column = catalogue.column
+    signals = {
+        'value': column('Value_Score')[candidates] / 100,
+        'rating': column('user rating')[candidates] / 5,
+    }
+    for signal, name in (('performance', PERFORMANCE), ('portability', PORTABILITY)):
+        score_range = preferences.get(f'{signal}_range')
+        if score_range:
+            centre = (score_range['min'] + score_range['max']) / 2
+            signals[signal] = 1 - np.minimum(1, np.abs(column(name)[candidates] - centre) / 100)
+
+    price_range = preferences.get('price_range')
+    if price_range:
+        centre = (price_range['min'] + price_range['max']) / 2
+        half_width = max(1.0, (price_range['max'] - price_range['min']) / 2)
+        # 1 at the centre of the budget, 0.5 at its edges and 0 one range width outside it
+        distance = np.abs(column(PRICE)[candidates] - centre) / half_width
+        signals['price'] = np.maximum(0, 1 - distance / 2)
+
+    total = sum(weights[signal] for signal in signals)
+    scores = np.zeros(len(candidates))
+    for signal, values in signals.items():
+        scores += weights[signal] * values
+    return scores / total if total else scores
+
+def rank_candidates(candidates: np.ndarray, preferences: Dict, catalogue: Catalogue, limit: int) -> np.ndarray:
+    """Best ``limit`` candidates, one per configuration, best first.
+
+    Only the top slice is sorted (np.argpartition); the full candidate list is
+    ordered only when duplicates leave that slice short of ``limit`` laptops.
+    """
+    scores = score_candidates(candidates, preferences, catalogue)
+    # Take a few extra so duplicate configurations can be dropped
+    pool = min(len(candidates), limit * 4)
+    if pool < len(candidates):
+        top = np.argpartition(-scores, pool - 1)[:pool]
+        # Keep every laptop tied with the slice's lowest score, so ties still go by catalogue order
+        top = np.flatnonzero(scores >= scores[top].min())
+    else:
+        top = np.arange(len(candidates))
+
+    while True:
+        # Best score first, ties in catalogue order
+        ordered = top[np.lexsort((candidates[top], -scores[top]))]
+        best = candidates[ordered[first_occurrences(catalogue.signatures[candidates[ordered]])]][:limit]
+        if len(best) == limit or len(top) == len(candidates):
+            return best
+        top = np.arange(len(candidates))
+
+def first_occurrences(values: np.ndarray) -> np.ndarray:
+    """Mask of the first occurrence of each value, like pandas' ``~Series.duplicated()``."""
+    keep = np.zeros(len(values), dtype=bool)
+    keep[np.unique(values, return_index=True)[1]] = True
+    return keep
+
+def format_results(candidates: np.ndarray, limit: int = 10, catalogue: Optional[Catalogue] = None,
+                   preferences: Optional[Dict] = None) -> Dict:
+    """Shape the top ``limit`` candidates for display.
+
+    With ``preferences`` the candidates are ranked by rank_candidates; otherwise
+    the first laptop of each configuration is taken in candidate order.
+    """
+    catalogue = catalogue or catalogues.current().catalogue
+    candidates = np.asarray(candidates, dtype=np.intp)
+    results = {
+        "status": "success",
+        "total_matches": len(candidates),
+        "filtered_laptops": []
+    }
+
+    if preferences is not None:
+        top = rank_candidates(candidates, preferences, catalogue, limit)
+    else:
+        # Keep the first laptop of each configuration, in candidate order
+        top = candidates[first_occurrences(catalogue.signatures[candidates])][:limit]
+
+    results["filtered_laptops"] = describe_laptops(top, catalogue)
+    return results
+
+def describe_laptops(positions: np.ndarray, catalogue: Catalogue) -> List[Dict]:
+    """Display records for the laptops at ``positions``, in order."""
+    top = np.asarray(positions, dtype=np.intp)
+    # Only the displayed rows' text is read from the catalogue
+    column = catalogue.column
+    rows = zip(
+        column(LAPTOP_ID)[top].astype(int).tolist(),
+        catalogue.text('name', top),
+        column(PRICE)[top].astype(int).tolist(),
+        catalogue.text('Processor name', top),
+        column(RAM)[top].astype(int).tolist(),
+        column(STORAGE)[top].astype(int).tolist(),
+        [gpu or "Integrated Graphics" for gpu in catalogue.text('gpu name ', top)],
+        column('Screen Size (in inch)')[top].tolist(),
+        column('Weight (in kg)')[top].tolist(),
+        column('battery_backup')[top].tolist(),
+        column(PERFORMANCE)[top].tolist(),
+        column(PORTABILITY)[top].tolist(),
+        column('Value_Score')[top].tolist(),
+    )
+
+    return [
+        {
+            "id": laptop_id,
+            "name": name,
+            "price": price,
+            "specifications": {
+                "processor": processor,
+                "ram": f"{ram}GB",
+                "storage": f"{storage}GB",
+                "gpu": gpu,
+                "screen_size": f"{screen_size:.1f}\"",
+                "weight": f"{weight:.2f} kg",
+                "battery": f"{battery:.1f} hours"
+            },
+            "scores": {
+                "performance": performance,
+                "portability": portability,
+                "value": value
+            }
+        }
+        for (laptop_id, name, price, processor, ram, storage, gpu, screen_size, weight, battery,
+             performance, portability, value) in rows
+    ]
+
+def find_similar(laptop_id: int, k: int = DEFAULT_SIMILAR_K, modifiers: Optional[List[str]] = None,
+                 constraints: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+                 snapshot: Optional[Snapshot] = None) -> Dict:
+    """The ``k`` laptops most like ``laptop_id``, in the same shape as filter_laptops results.
+
+    ``modifiers`` (keys of SIMILARITY_MODIFIERS, e.g. 'cheaper') only keep
+    laptops that differ from the reference in that direction; ``constraints``
+    are absolute (min, max) column ranges. Raises ValueError for an unknown modifier.
+    """
+    unknown = [modifier for modifier in modifiers or [] if modifier not in SIMILARITY_MODIFIERS]
+    if unknown:
+        raise ValueError(f"Unknown modifier {unknown[0]!r}; expected one of {', '.join(SIMILARITY_MODIFIERS)}")
+
+    snapshot = snapshot or catalogues.current()
+    similar = snapshot.index.similar
+    position = similar.position(laptop_id)
+    if position is None:
+        return {
+            "status": "not_found",
+            "message": f"No laptop with id {laptop_id}",
+            "filtered_laptops": [],
+            "catalogue_version": snapshot.version
+        }
+
+    constraints = dict(constraints or {})
+    for column, direction in (SIMILARITY_MODIFIERS[modifier] for modifier in modifiers or []):
+        reference = float(snapshot.catalogue.column(column)[position])
+        low, high = constraints.get(column, (None, None))
+        if direction == 'below':
+            limit = np.nextafter(reference, -np.inf)
+            high = limit if high is None else min(high, limit)
+        else:
+            limit = np.nextafter(reference, np.inf)
+            low = limit if low is None else max(low, limit)
+        constraints[column] = (low, high)
+
+    k = min(MAX_TOP_K, max(1, int(k)))
+    nearest = similar.nearest(position, k, constraints)
+    return {
+        "status": "success",
+        "reference": describe_laptops([position], snapshot.catalogue)[0],
+        "total_matches": len(nearest),
+        "filtered_laptops": describe_laptops(nearest, snapshot.catalogue),
+        "catalogue_version": snapshot.version
+    }
@@ -0,0 +1,180 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+# Seconds between purges of expired sessions from the SQLite backend
+SWEEP_INTERVAL = 60
+
+
+def new_state() -> Dict:
+    return {
+        "parsed_data": None,
+        "recommendations": None,
+        # Matching positions of the last search, refined by follow-ups (see recommendation.refine_laptops)
+        "candidates": None,
+    }
+
+
+class _Entry:
+    __slots__ = ("state", "messages", "size", "last_seen")
+
+    def __init__(self, state: Dict, messages: List["BaseMessage"]):
+        self.state = state
+        self.messages = messages
+        self.size = 0
+        self.last_seen = time.time()
+
+
+class SessionStore:
+    """Bounded store of per-client chat sessions.
+
+    Sessions are evicted least-recently-used first once there are more than
+    ``max_sessions`` of them or their approximate size passes ``max_bytes``,
+    and dropped after ``idle_ttl`` seconds without a request. Each session
+    keeps at most ``max_messages`` history messages. With ``path`` set,
+    sessions are read from and written through to a SQLite file so several
+    worker processes can share them; memory then only holds a bounded cache.
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_ttl: float = 3600, max_bytes: int = 256 * 1024 * 1024,
+                 max_messages: int = 50, path: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._db = None
+        self._next_sweep = 0.0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, state TEXT NOT NULL, messages TEXT NOT NULL, last_seen REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+
+    def load(self, session_id: str) -> Dict:
+        """Return a copy of the session state, creating the session if needed."""
+        with self._lock:
+            return json.loads(json.dumps(self._entry(session_id).state))
+
+    def save(self, session_id: str, state: Dict) -> None:
+        with self._lock:
+            entry = self._entry(session_id)
+            entry.state = json.loads(json.dumps(state))
+            self._persist(session_id, entry)
+
+    def messages(self, session_id: str) -> List["BaseMessage"]:
+        with self._lock:
+            return list(self._entry(session_id).messages)
+
+    def add_messages(self, session_id: str, messages: Sequence["BaseMessage"]) -> None:
+        with self._lock:
+            entry = self._entry(session_id)
+            entry.messages = (entry.messages + list(messages))[-self.max_messages:]
+            self._persist(session_id, entry)
+
+    def clear_messages(self, session_id: str) -> None:
+        with self._lock:
+            entry = self._entry(session_id)
+            entry.messages = []
+            self._persist(session_id, entry)
+
+    def history(self, session_id: str) -> 'SessionHistory':
+        # Imported on first use: LangChain's chat history base class is only needed by the chains
+        from session_history import SessionHistory
+        return SessionHistory(self, session_id)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry.size
+            if self._db is not None:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+            }
+
+    def _entry(self, session_id: str) -> _Entry:
+        now = time.time()
+        entry = self._entries.get(session_id)
+        if entry is not None and now - entry.last_seen > self.idle_ttl:
+            self.delete(session_id)
+            entry = None
+
+        if self._db is not None:
+            # Another worker may have updated the session since it was cached
+            row = self._db.execute(
+                "SELECT state, messages, last_seen FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is not None and now - row[2] <= self.idle_ttl:
+                # Imported here: its module pulls in LangChain's text splitters, which are slow to import
+                from langchain_core.messages import messages_from_dict
+                if entry is not None:
+                    self._bytes -= entry.size
+                entry = _Entry(json.loads(row[0]), messages_from_dict(json.loads(row[1])))
+                entry.size = len(row[0]) + len(row[1])
+                self._bytes += entry.size
+            elif entry is not None:
+                self.delete(session_id)
+                entry = None
+
+        if entry is None:
+            entry = _Entry(new_state(), [])
+
+        entry.last_seen = now
+        self._entries[session_id] = entry
+        self._entries.move_to_end(session_id)
+        self._evict(now)
+        return entry
+
+    def _persist(self, session_id: str, entry: _Entry) -> None:
+        from langchain_core.messages import messages_to_dict
+
+        state = json.dumps(entry.state)
+        messages = json.dumps(messages_to_dict(entry.messages))
+        self._bytes += len(state) + len(messages) - entry.size
+        entry.size = len(state) + len(messages)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (id, state, messages, last_seen) VALUES (?, ?, ?, ?)",
+                (session_id, state, messages, entry.last_seen),
+            )
+        self._evict(entry.last_seen)
+
+    def _evict(self, now: float) -> None:
+        # LRU order is also idle order, so expired sessions are always at the
+        # front; the session being served is at the back and is never evicted
+        while len(self._entries) > 1:
+            _, oldest = next(iter(self._entries.items()))
+            expired = now - oldest.last_seen > self.idle_ttl
+            if not expired and len(self._entries) <= self.max_sessions and self._bytes <= self.max_bytes:
+                break
+            self._entries.popitem(last=False)
+            self._bytes -= oldest.size
+            self.evictions += 1
+
+        if self._db is not None and now >= self._next_sweep:
+            self._db.execute("DELETE FROM sessions WHERE last_seen < ?", (now - self.idle_ttl,))
+            self._next_sweep = now + SWEEP_INTERVAL
+
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, Tuple
+
+# Raised to callers sharing a stream whose leader stopped reading it part way
+ABANDONED_MESSAGE = "the shared call was abandoned before it finished"
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Broadcast:
+    """Chunks of one stream, replayed to every caller that shares it."""
+
+    def __init__(self):
+        self.chunks = []
+        # complete: the source was read to the end; finished: no more chunks will come
+        self.complete = False
+        self.finished = False
+        self.error = None
+        self.condition = threading.Condition()
+        # Async callers wait on this; it is replaced after every change
+        self.changed = None
+
+
+class SingleFlight:
+    """Lets identical concurrent calls share one execution.
+
+    The first caller for a key (the leader) makes the call; callers arriving
+    with the same key while it is in flight get its result, or its exception,
+    instead of making their own. Finished calls are forgotten, so this never
+    serves stale results. Every method returns ``(result, shared)``.
+    ``calls`` counts executions and ``coalesced`` the callers that shared one.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flights: Dict[Any, _Flight] = {}
+        self._tasks: Dict[Any, asyncio.Task] = {}
+        self._streams: Dict[Any, _Broadcast] = {}
+
+    def _join(self, flights: Dict, key, create: Callable[[], Any]) -> Tuple[Any, bool]:
+        with self._lock:
+            flight = flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, True
+            flight = flights[key] = create()
+            self.calls += 1
+            return flight, False
+
+    def _forget(self, flights: Dict, key, flight) -> None:
+        with self._lock:
+            if flights.get(key) is flight:
+                del flights[key]
+
+    def do(self, key, call: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``call()`` unless an identical call is in flight on another thread."""
+        flight, shared = self._join(self._flights, key, _Flight)
+        if shared:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = call()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._forget(self._flights, key, flight)
+            flight.done.set()
+        return flight.result, False
+
+    async def ado(self, key, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Await ``call()`` unless an identical call is in flight on this event loop.
+
+        The call runs as its own task, so a caller that is cancelled (a client
+        disconnecting) does not cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+
+        def start():
+            task = loop.create_task(call())
+            task.add_done_callback(lambda _: self._forget(self._tasks, (id(loop), key), task))
+            return task
+
+        task, shared = self._join(self._tasks, (id(loop), key), start)
+        return await asyncio.shield(task), shared
+
+    def stream(self, key, open_stream: Callable[[], Iterable]) -> Tuple[Iterator, bool]:
+        """Iterate ``open_stream()``, sharing its chunks with identical streams started meanwhile.
+
+        Callers that join late first receive the chunks already produced.
+        """
+        broadcast, shared = self._join(self._streams, key, _Broadcast)
+        if shared:
+            return self._follow(broadcast), True
+        return self._lead(key, broadcast, open_stream), False
+
+    def _lead(self, key, broadcast: _Broadcast, open_stream: Callable[[], Iterable]) -> Iterator:
+        try:
+            for chunk in open_stream():
+                self._publish(broadcast, chunk)
+                yield chunk
+            broadcast.complete = True
+        except Exception as e:
+            broadcast.error = e
+            raise
+        finally:
+            self._forget(self._streams, key, broadcast)
+            self._finish(broadcast)
+
+    def _follow(self, broadcast: _Broadcast) -> Iterator:
+        position = 0
+        while True:
+            with broadcast.condition:
+                while position >= len(broadcast.chunks) and not broadcast.finished:
+                    broadcast.condition.wait()
+                if position < len(broadcast.chunks):
+                    chunk = broadcast.chunks[position]
+                    position += 1
+                elif broadcast.error is not None:
+                    raise broadcast.error
+                else:
+                    return
+            yield chunk
+
+    def astream(self, key, open_stream: Callable[[], AsyncIterator]) -> Tuple[AsyncIterator, bool]:
+        """Async counterpart of stream, for streams on one event loop."""
+        loop = asyncio.get_running_loop()
+
+        def create():
+            broadcast = _Broadcast()
+            broadcast.changed = asyncio.Event()
+            return broadcast
+
+        broadcast, shared = self._join(self._streams, (id(loop), key), create)
+        if shared:
+            return self._afollow(broadcast), True
+        return self._alead((id(loop), key), broadcast, open_stream), False
+
+    async def _alead(self, key, broadcast: _Broadcast, open_stream: Callable[[], AsyncIterator]) -> AsyncIterator:
+        try:
+            async for chunk in open_stream():
+                self._publish(broadcast, chunk)
+                yield chunk
+            broadcast.complete = True
+        except Exception as e:
+            broadcast.error = e
+            raise
+        finally:
+            self._forget(self._streams, key, broadcast)
+            self._finish(broadcast)
+
+    async def _afollow(self, broadcast: _Broadcast) -> AsyncIterator:
+        position = 0
+        while True:
+            changed = broadcast.changed
+            if position < len(broadcast.chunks):
+                position += 1
+                yield broadcast.chunks[position - 1]
+            elif broadcast.finished:
+                if broadcast.error is not None:
+                    raise broadcast.error
+                return
+            else:
+                await changed.wait()
+
+    def _publish(self, broadcast: _Broadcast, chunk) -> None:
+        with broadcast.condition:
+            broadcast.chunks.append(chunk)
+            broadcast.condition.notify_all()
+        self._signal(broadcast)
+
+    def _finish(self, broadcast: _Broadcast) -> None:
+        with broadcast.condition:
+            if broadcast.error is None and not broadcast.complete:
+                broadcast.error = RuntimeError(ABANDONED_MESSAGE)
+            broadcast.finished = True
+            broadcast.condition.notify_all()
+        self._signal(broadcast)
+
+    @staticmethod
+    def _signal(broadcast: _Broadcast) -> None:
+        if broadcast.changed is not None:
+            changed, broadcast.changed = broadcast.changed, asyncio.Event()
+            changed.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced}
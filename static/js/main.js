@@ -1,66 +1,234 @@
-document.addEventListener('DOMContentLoaded', function () {
-    const form = document.getElementById('chat-form');
-    const userInput = document.getElementById('user-input');
-    const chatBox = document.getElementById('chat-box');
-    const promptButtons = document.querySelectorAll('.prompt-btn');
-
-    function createLoadingAnimation() {
-        const loadingDiv = document.createElement('div');
-        loadingDiv.className = 'loading';
-        for (let i = 0; i < 3; i++) {
-            const dot = document.createElement('span');
-            loadingDiv.appendChild(dot);
-        }
-        return loadingDiv;
-    }
-
-    promptButtons.forEach(button => {
-        button.addEventListener('click', function () {
-            const promptText = this.textContent.replace(/['"]/g, ''); 
-            userInput.value = promptText;
-            form.dispatchEvent(new Event('submit'));
-        });
-    });
-
-    form.addEventListener('submit', function (e) {
-        e.preventDefault();
-        const message = userInput.value;
-        if (!message.trim()) return; 
-
-        appendMessage(message, 'user-message');
-        userInput.value = '';
-
-        const loadingAnimation = createLoadingAnimation();
-        chatBox.appendChild(loadingAnimation);
-
-        fetch('/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ message })
-        })
-            .then(response => response.json())
-            .then(data => {
-                loadingAnimation.remove();
-                appendMessage(data.response, 'bot-message');
-            })
-            .catch(error => {
-                loadingAnimation.remove();
-                console.error('Error:', error);
-                appendMessage('Sorry, something went wrong. Please try again.', 'bot-message');
-            });
-    });
-
-    function appendMessage(message, className) {
-        const messageDiv = document.createElement('div');
-        messageDiv.className = `message ${className}`;
-        if (className === 'bot-message') {
-            messageDiv.innerHTML = message;
-        } else {
-            messageDiv.textContent = message;
-        }
-        chatBox.appendChild(messageDiv);
-
-    }
-});
+document.addEventListener('DOMContentLoaded', function () {
+    const form = document.getElementById('chat-form');
+    const userInput = document.getElementById('user-input');
+    const chatBox = document.getElementById('chat-box');
+    const promptButtons = document.querySelectorAll('.prompt-btn');
+    const facetBar = document.getElementById('facet-bar');
+
+    // Facets shown as filter chips, and those whose filter is a minimum (counted cumulatively;
+    // CPU buckets only within their family, the part of the value before the dash)
+    const CHIP_FACETS = { price: 'Budget', ram: 'RAM', storage: 'Storage', gpu: 'Graphics', cpu: 'Processor' };
+    const AT_LEAST_FACETS = new Set(['ram', 'storage', 'cpu']);
+    const selectedChips = {};
+    let filterMessage = null;
+
+    function createLoadingAnimation() {
+        const loadingDiv = document.createElement('div');
+        loadingDiv.className = 'loading';
+        for (let i = 0; i < 3; i++) {
+            const dot = document.createElement('span');
+            loadingDiv.appendChild(dot);
+        }
+        return loadingDiv;
+    }
+
+    promptButtons.forEach(button => {
+        button.addEventListener('click', function () {
+            const promptText = this.textContent.replace(/['"]/g, ''); 
+            userInput.value = promptText;
+            form.dispatchEvent(new Event('submit'));
+        });
+    });
+
+    form.addEventListener('submit', function (e) {
+        e.preventDefault();
+        const message = userInput.value;
+        if (!message.trim()) return; 
+
+        appendMessage(message, 'user-message');
+        userInput.value = '';
+
+        const loadingAnimation = createLoadingAnimation();
+        chatBox.appendChild(loadingAnimation);
+
+        fetch('/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ message })
+        })
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return readEvents(response, loadingAnimation);
+            })
+            .catch(error => {
+                loadingAnimation.remove();
+                console.error('Error:', error);
+                appendMessage('Sorry, something went wrong. Please try again.', 'bot-message');
+            });
+    });
+
+    // Render a Server-Sent Events reply as it arrives
+    async function readEvents(response, loadingAnimation) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let messageDiv = null;
+        let matchesDiv = null;
+        let textDiv = null;
+
+        function ensureMessage() {
+            if (!messageDiv) {
+                loadingAnimation.remove();
+                messageDiv = appendMessage('', 'bot-message');
+                matchesDiv = document.createElement('div');
+                textDiv = document.createElement('div');
+                messageDiv.append(matchesDiv, textDiv);
+            }
+        }
+
+        function handleEvent(event, data) {
+            ensureMessage();
+            if (event === 'recommendations') {
+                renderMatches(matchesDiv, data);
+            } else if (event === 'token') {
+                textDiv.textContent += data;
+            } else if (event === 'done') {
+                textDiv.innerHTML = data.response;
+            }
+            chatBox.scrollTop = chatBox.scrollHeight;
+        }
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                handleEvent(event, JSON.parse(data));
+            }
+        }
+        ensureMessage();
+    }
+
+    // Filter chips query /facets directly, without the chat
+    function chipPreferences() {
+        const preferences = {};
+        Object.values(selectedChips).forEach(chip => {
+            Object.entries(chip.filter).forEach(([key, value]) => {
+                preferences[key] = key === 'specifications' ? { ...preferences[key], ...value } : value;
+            });
+        });
+        return preferences;
+    }
+
+    function updateFacets() {
+        const selected = Object.keys(selectedChips).length > 0;
+        const request = selected
+            ? fetch('/facets', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ preferences: chipPreferences() })
+            })
+            : fetch('/facets');
+
+        request
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(data => {
+                renderFacets(data.facets);
+                if (filterMessage) filterMessage.remove();
+                filterMessage = null;
+                if (!selected) return;
+
+                filterMessage = appendMessage('', 'bot-message');
+                if (data.matches === 0) {
+                    filterMessage.textContent = 'No laptops match all of the selected filters.';
+                } else {
+                    renderMatches(filterMessage, data.recommendations);
+                    const details = filterMessage.querySelector('details');
+                    if (details) details.open = true;
+                }
+                chatBox.scrollTop = chatBox.scrollHeight;
+            })
+            .catch(error => console.error('Error:', error));
+    }
+
+    function renderFacets(facets) {
+        facetBar.innerHTML = '';
+        Object.entries(CHIP_FACETS).forEach(([name, title]) => {
+            const buckets = facets[name] || [];
+            const group = document.createElement('div');
+            group.className = 'facet-group';
+            const heading = document.createElement('span');
+            heading.className = 'facet-title';
+            heading.textContent = title;
+            group.appendChild(heading);
+
+            buckets.forEach((bucket, i) => {
+                if (!bucket.filter) return;
+                let count = bucket.count;
+                if (AT_LEAST_FACETS.has(name)) {
+                    const family = String(bucket.value).split('-')[0];
+                    count = buckets.slice(i)
+                        .filter(other => name !== 'cpu' || String(other.value).split('-')[0] === family)
+                        .reduce((total, other) => total + other.count, 0);
+                }
+                const chip = document.createElement('button');
+                chip.type = 'button';
+                chip.className = 'chip';
+                chip.textContent = `${bucket.label}${AT_LEAST_FACETS.has(name) ? '+' : ''} (${count})`;
+                const isSelected = selectedChips[name] && selectedChips[name].value === bucket.value;
+                if (isSelected) chip.classList.add('selected');
+                chip.disabled = count === 0 && !isSelected;
+                chip.addEventListener('click', function () {
+                    if (isSelected) {
+                        delete selectedChips[name];
+                    } else {
+                        selectedChips[name] = { value: bucket.value, filter: bucket.filter };
+                    }
+                    updateFacets();
+                });
+                group.appendChild(chip);
+            });
+            facetBar.appendChild(group);
+        });
+    }
+
+    function renderMatches(container, data) {
+        const laptops = data.filtered_laptops || [];
+        if (!laptops.length) return;
+
+        const details = document.createElement('details');
+        details.className = 'matches';
+        const summary = document.createElement('summary');
+        summary.textContent = `${data.total_matches} matching laptops`;
+        const list = document.createElement('ul');
+        laptops.forEach(laptop => {
+            const item = document.createElement('li');
+            item.textContent = `${laptop.name} \u2014 \u20b9${laptop.price.toLocaleString('en-IN')}`;
+            list.appendChild(item);
+        });
+        details.append(summary, list);
+        container.appendChild(details);
+    }
+
+    function appendMessage(message, className) {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = `message ${className}`;
+        if (className === 'bot-message') {
+            messageDiv.innerHTML = message;
+        } else {
+            messageDiv.textContent = message;
+        }
+        chatBox.appendChild(messageDiv);
+        return messageDiv;
+    }
+
+    updateFacets();
+});